@@ -1,6 +1,26 @@
 
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
-from src.genai_sql_engine import generate_chat_title
+
+from src.admission import AdmissionRejected
+from src.approximate import is_estimate
+from src.genai_sql_engine import (
+    initialize_database,
+    load_schema,
+    load_prompt_template,
+    run_admitted,
+    execute_sql,
+    explain_result,
+    generate_chat_title,
+    get_prompt_stats,
+    admission,
+    explanation_cache,
+    followups,
+    llm,
+    remember_result
+)
 
 
 if "query_history" not in st.session_state:
@@ -12,27 +32,13 @@ if "active_query_id" not in st.session_state:
 if "view_mode" not in st.session_state:
     st.session_state.view_mode = "new"
 
-if "query_count" not in st.session_state:
-    st.session_state.query_count = 0
-
-
+# Identifies this session to the process-wide admission limits
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 
-# ---------------- Cost Guardrails ----------------
-MAX_QUERIES_PER_SESSION = 5
-
-# ---------------- Imports ----------------
-
-from src.genai_sql_engine import (
-    initialize_database,
-    load_schema,
-    load_prompt_template,
-    generate_sql,
-    execute_sql,
-    explain_result,
-    validate_sql
-)
-
-initialize_database()
+# query_id -> Future of the exact result behind an estimate
+if "exact_runs" not in st.session_state:
+    st.session_state.exact_runs = {}
 
 # ---------------- Page setup ----------------
 st.set_page_config(page_title="GenAI SQL Assistant", layout="wide")
@@ -48,6 +54,9 @@ def render_explanation(explanation: dict):
         st.info("No explanation available.")
         return
 
+    if explanation.get("note"):
+        st.warning(explanation["note"])
+
     # ----------- KEY INSIGHTS -----------
     st.markdown(
         """
@@ -117,6 +126,56 @@ def render_explanation(explanation: dict):
 
 
 
+def upgrade_to_exact(query_id):
+    """
+    Swaps an estimate in history for the exact result once it is ready.
+    """
+    future = st.session_state.exact_runs.get(query_id)
+    item = st.session_state.query_history[query_id]
+
+    st.session_state.active_query_id = query_id
+    st.session_state.view_mode = "history"
+
+    if future is None or not future.done():
+        return
+    try:
+        item["columns"], item["rows"] = future.result()
+    except RuntimeError as e:
+        item["exact_error"] = str(e)
+    else:
+        item["estimate"] = False
+        # Follow-ups refine the latest answer only
+        if query_id == len(st.session_state.query_history) - 1:
+            remember_result(
+                st.session_state.session_id, item["question"], item["sql"],
+                item["columns"], item["rows"]
+            )
+    del st.session_state.exact_runs[query_id]
+
+
+def render_estimate_notice(query_id):
+    item = st.session_state.query_history[query_id]
+    if not item.get("estimate"):
+        return
+
+    st.caption(
+        "≈ Estimated from sampled data; *_ci_low / *_ci_high give a 95% confidence interval."
+    )
+    if item.get("exact_error"):
+        st.warning(f"Exact answer failed: {item['exact_error']}")
+        return
+
+    future = st.session_state.exact_runs.get(query_id)
+    st.button(
+        "Show exact answer" if future and future.done() else "Exact answer is running… check again",
+        key=f"exact_{query_id}",
+        on_click=upgrade_to_exact,
+        args=(query_id,)
+    )
+
+
+
+
 # ---------------- Query History Sidebar ----------------
 st.sidebar.markdown("History")
 
@@ -140,15 +199,32 @@ for idx, item in enumerate(reversed(st.session_state.query_history)):
 
         st.rerun()
 
+with st.sidebar.expander("Diagnostics"):
+    st.json({
+        "prompt_cache": get_prompt_stats(),
+        "admission": admission.metrics(),
+        "explanation_cache": explanation_cache.stats(),
+        "followups": followups.stats(),
+        "llm": llm.stats()
+    })
+
 # ---------------- Load resources ----------------
 @st.cache_resource
 def load_resources():
+    # Once per process, not on every script rerun
+    initialize_database()
     schema = load_schema()
     prompt = load_prompt_template()
     return schema, prompt
 
 schema, prompt = load_resources()
 
+
+@st.cache_resource
+def exact_executor():
+    # Background exact runs behind approximate answers
+    return ThreadPoolExecutor(max_workers=2, thread_name_prefix="exact")
+
 # ---------------- User input ----------------
 question = st.text_input(
     "Ask your data question:",
@@ -156,6 +232,17 @@ question = st.text_input(
     key="question_input"
 )
 
+approximate = st.checkbox(
+    "Fast estimate for large aggregates (sampled data, exact answer follows)",
+    key="approximate"
+)
+
+followup = st.checkbox(
+    "Follow-up on the previous result",
+    key="followup",
+    disabled=not followups.has_context(st.session_state.session_id)
+)
+
 if "view_mode" not in st.session_state:
     st.session_state.view_mode = "new"
 
@@ -171,35 +258,30 @@ if (
 
 # ---------------- Run pipeline ----------------
 if st.button("Run Query") and question:
-    if st.session_state.query_count >= MAX_QUERIES_PER_SESSION:
-        st.error("❌ Query limit reached for this session.")
-        st.stop()
-
-    st.session_state.query_count += 1
-
      # CLEAR old view
     st.session_state.view_mode = "new"
     st.session_state.active_query_id = None
 
-    # 1️. Generate SQL
-    with st.spinner("Generating SQL..."):
-        sql = generate_sql(prompt, schema, question)
+    # 1️. Generate, validate and execute SQL (rate limited, deduplicated)
+    with st.spinner("Generating and executing SQL..."):
+        try:
+            sql, cols, rows = run_admitted(
+                prompt,
+                schema,
+                question,
+                user_id=st.session_state.session_id,
+                approximate=approximate,
+                session_id=st.session_state.session_id,
+                followup=followup
+            )
+        except (AdmissionRejected, ValueError, RuntimeError) as e:
+            st.error(str(e))
+            st.stop()
 
     st.subheader("🧾 Generated SQL")
     st.code(sql, language="sql")
 
-    # 2️. Validate SQL
-    try:
-        validate_sql(sql)
-    except ValueError as e:
-        st.error(str(e))
-        st.stop()
-
-    # 3️. Execute SQL
-    with st.spinner("Executing query..."):
-        cols, rows = execute_sql(sql)
-
-    # 4. Show query results
+    # 2. Show query results
     st.subheader("📊 Query Result")
 
     if rows and cols:
@@ -208,18 +290,18 @@ if st.button("Run Query") and question:
     else:
         st.info("No results returned.")
 
-    # 5. Generate explanation
+    # 3. Generate explanation
     
     if rows:
         with st.spinner("Generating explanation..."):
-            explanation = explain_result(question, cols, rows)
+            explanation = explain_result(question, cols, rows, sql=sql)
 
         render_explanation(explanation)
 
     else:
         st.info("No rows available for explanation.")
     
-    # 6. Save Query History
+    # 4. Save Query History
     from datetime import datetime
  
     query_id = len(st.session_state.query_history)
@@ -234,12 +316,18 @@ if st.button("Run Query") and question:
         "columns": cols,
         "rows": rows,
         "explanation": explanation if rows else [],
-        "time": datetime.now().strftime("%H:%M")
+        "time": datetime.now().strftime("%H:%M"),
+        "estimate": is_estimate(cols)
     })
 
         # Make this query active
     st.session_state.active_query_id = len(st.session_state.query_history) - 1
 
+    # Upgrade estimates to the exact answer in the background
+    if is_estimate(cols):
+        st.session_state.exact_runs[query_id] = exact_executor().submit(execute_sql, sql)
+        render_estimate_notice(query_id)
+
 
 # ---------------- Render Active Query ----------------
 if active_item:
@@ -262,6 +350,8 @@ if active_item:
     else:
         st.info("No results returned.")
 
+    render_estimate_notice(st.session_state.active_query_id)
+
     render_explanation(active_item["explanation"])
 
     
@@ -0,0 +1,253 @@
+"""
+Headless HTTP API for dashboards and batch jobs.
+
+Runs the same engine as app.py behind JSON endpoints. Blocking work (LLM
+calls, SQLite) runs on bounded thread pools so the event loop stays free;
+the SQLite connection pool, prompt cache, explanation cache and admission
+limits are shared by every request in the process.
+
+    uvicorn service:app --host 0.0.0.0 --port 8000
+
+Endpoints:
+    GET  /health
+    POST /query          {"question", "user_id"?, "priority"?, "approximate"?,
+                          "session_id"?, "followup"?} -> sql, columns, rows
+    POST /query/stream   {"question", "user_id"?, "priority"?}
+                         -> NDJSON: {"sql", "columns"} then {"rows": [...]} batches
+    POST /explain        {"question", "columns", "rows", "sql"?, "user_id"?, "priority"?}
+                         -> insights, recommendations
+    POST /ask            /query + /explain in one call
+"""
+
+import asyncio
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict
+
+from src import genai_sql_engine as engine
+from src.admission import AdmissionRejected
+from src.backends import SQLITE_POOL_SIZE
+from src.llm_client import LLMUnavailable
+
+# LLM round trips dominate; SQLite work is capped at the connection pool
+PIPELINE_WORKERS = 32
+STREAM_BATCH_SIZE = 1000
+
+# Each open stream holds a pooled connection between batches. Capping them
+# below the pool (and the sqlite executor) keeps a free connection and
+# thread for the streams already running, /health and plain queries.
+MAX_OPEN_STREAMS = SQLITE_POOL_SIZE // 2
+STREAM_CONNECT_TIMEOUT_S = 5.0
+
+# Per-client limits (one bucket per user_id). The engine defaults are sized
+# for one person in the Streamlit app, not for dashboards and batch jobs;
+# the global LLM / SQLite buckets still cap the whole process.
+API_USER_BURST = int(os.getenv("API_USER_BURST", "100"))
+API_USER_RATE_PER_S = float(os.getenv("API_USER_RATE_PER_S", "20"))
+
+resources = {}
+
+
+@asynccontextmanager
+async def lifespan(app):
+    engine.initialize_database()
+    resources["schema"] = engine.load_schema()
+    resources["prompt"] = engine.load_prompt_template()
+    resources["pipeline"] = ThreadPoolExecutor(PIPELINE_WORKERS, thread_name_prefix="pipeline")
+    resources["sqlite"] = ThreadPoolExecutor(SQLITE_POOL_SIZE, thread_name_prefix="sqlite")
+    resources["streams"] = threading.BoundedSemaphore(MAX_OPEN_STREAMS)
+    engine.admission.user_rate = API_USER_RATE_PER_S
+    engine.admission.user_burst = API_USER_BURST
+    yield
+    resources["pipeline"].shutdown(wait=False, cancel_futures=True)
+    resources["sqlite"].shutdown(wait=False, cancel_futures=True)
+
+
+app = FastAPI(title="GenAI SQL Assistant", lifespan=lifespan)
+
+
+class QueryRequest(BaseModel):
+    question: str
+    user_id: str = "api"
+    priority: int = 0
+    # Sampled estimate with *_ci_low / *_ci_high columns where eligible
+    approximate: bool = False
+    # Answers are kept for follow-ups only under an explicit session id;
+    # followup=True refines that session's previous result (prev_result)
+    session_id: Optional[str] = None
+    followup: bool = False
+
+
+class StreamRequest(BaseModel):
+    # Streams exact rows only: approximate / followup are refused, not ignored
+    model_config = ConfigDict(extra="forbid")
+
+    question: str
+    user_id: str = "api"
+    priority: int = 0
+
+
+class ExplainRequest(BaseModel):
+    question: str
+    user_id: str = "api"
+    priority: int = 0
+    columns: list[str]
+    rows: list[list[Any]]
+    # The query behind the rows, for table-level cache invalidation
+    sql: Optional[str] = None
+
+
+class AskRequest(QueryRequest):
+    explain: bool = True
+
+
+async def run_blocking(pool, fn, *args):
+    """
+    Runs fn on the "pipeline" (LLM + SQL) or "sqlite" thread pool.
+    """
+    return await asyncio.get_running_loop().run_in_executor(resources[pool], fn, *args)
+
+
+def to_http_error(e: Exception) -> HTTPException:
+    if isinstance(e, AdmissionRejected):
+        return HTTPException(status_code=429, detail=str(e))
+    if isinstance(e, LLMUnavailable):
+        return HTTPException(status_code=503, detail=str(e))
+    if isinstance(e, TimeoutError):
+        return HTTPException(status_code=503, detail="Database busy. Please try again shortly.")
+    if isinstance(e, ValueError):
+        return HTTPException(status_code=400, detail=str(e))
+    if isinstance(e, RuntimeError):
+        return HTTPException(status_code=422, detail=str(e))
+    return HTTPException(status_code=502, detail=f"Upstream error: {e}")
+
+
+async def run_query(req: QueryRequest):
+    def pipeline():
+        return engine.run_admitted(
+            resources["prompt"],
+            resources["schema"],
+            req.question,
+            user_id=req.user_id,
+            priority=req.priority,
+            approximate=req.approximate,
+            session_id=req.session_id,
+            followup=req.followup
+        )
+
+    try:
+        sql, cols, rows = await run_blocking("pipeline", pipeline)
+    except Exception as e:
+        raise to_http_error(e)
+    return {"sql": sql, "columns": cols, "rows": rows}
+
+
+@app.get("/health")
+async def health():
+    version = await run_blocking("sqlite", engine.get_data_version)
+    return {"status": "ok", "data_version": version}
+
+
+@app.post("/query")
+async def query(req: QueryRequest):
+    return await run_query(req)
+
+
+@app.post("/explain")
+async def explain(req: ExplainRequest):
+    rows = [tuple(row) for row in req.rows]
+
+    def explain_admitted():
+        # Same per-user limits as /query; identical explanations coalesce
+        key = engine.result_fingerprint(
+            engine.normalize_question(req.question), req.columns, rows
+        )
+        return engine.admission.run(
+            req.user_id,
+            "explain:" + key,
+            lambda: engine.explain_result(req.question, req.columns, rows, req.sql),
+            priority=req.priority
+        )
+
+    try:
+        return await run_blocking("pipeline", explain_admitted)
+    except Exception as e:
+        raise to_http_error(e)
+
+
+@app.post("/ask")
+async def ask(req: AskRequest):
+    result = await run_query(req)
+
+    explanation: Optional[dict] = None
+    if req.explain and result["rows"]:
+        rows = [tuple(row) for row in result["rows"]]
+        try:
+            explanation = await run_blocking(
+                "pipeline", engine.explain_result, req.question, result["columns"], rows,
+                result["sql"]
+            )
+        except Exception as e:
+            raise to_http_error(e)
+    return {**result, "explanation": explanation}
+
+
+@app.post("/query/stream")
+async def query_stream(req: StreamRequest):
+    def prepare():
+        # Same limits and coalescing as /query, but only up to the SQL
+        return engine.admission.run(
+            req.user_id,
+            "prepare:" + engine.normalize_question(req.question),
+            lambda: engine.prepare_sql(resources["prompt"], resources["schema"], req.question),
+            priority=req.priority
+        )
+
+    try:
+        sql = await run_blocking("pipeline", prepare)
+    except Exception as e:
+        raise to_http_error(e)
+
+    slots = resources["streams"]
+    if not slots.acquire(blocking=False):
+        raise HTTPException(status_code=503, detail="Too many open streams. Please try again shortly.")
+
+    batches = None
+    try:
+        batches = engine.stream_sql(sql, STREAM_BATCH_SIZE, timeout=STREAM_CONNECT_TIMEOUT_S)
+        cols = await run_blocking("sqlite", next, batches)
+    except Exception as e:
+        if batches is not None:
+            batches.close()
+        slots.release()
+        raise to_http_error(e)
+
+    async def ndjson():
+        try:
+            yield json.dumps({"sql": sql, "columns": cols}) + "\n"
+            while True:
+                batch = await run_blocking("sqlite", next, batches, None)
+                if batch is None:
+                    return
+                yield json.dumps({"rows": batch}, default=str) + "\n"
+        finally:
+            # Returns the pooled connection if the client disconnects early
+            try:
+                await run_blocking("sqlite", batches.close)
+            finally:
+                slots.release()
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("service:app", host="0.0.0.0", port=8000)
@@ -0,0 +1,259 @@
+"""
+Process-wide admission control in front of run_safe_sql.
+
+- SingleFlight: concurrent identical questions share one LLM call and
+  one execution instead of each paying for their own.
+- TokenBucket: per-user and global (LLM, SQLite) rate limits that allow
+  short bursts but cap sustained load.
+- AdmissionController: run() charges the user's bucket once per request.
+  The global buckets are charged by the work itself, via charge(), around
+  each LLM request and each SQL execution. Waiters for global capacity
+  sit in a bounded priority queue instead of failing; queue time is
+  recorded.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# Per user: burst of 5 queries, then one every 12 seconds
+USER_BURST = 5
+USER_RATE_PER_S = 1 / 12
+
+# Global capacity shared by every session in the process
+LLM_BURST = 20
+LLM_RATE_PER_S = 5.0
+SQLITE_BURST = 40
+SQLITE_RATE_PER_S = 20.0
+
+MAX_QUEUE = 64
+MAX_QUEUE_WAIT_S = 30.0
+MAX_TRACKED_USERS = 10_000
+
+
+class AdmissionRejected(RuntimeError):
+    pass
+
+
+class TokenBucket:
+    """
+    Not thread-safe on its own; AdmissionController serializes access.
+    """
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n=1):
+        """
+        Seconds until n tokens are available (0 if available now).
+        """
+        self._refill()
+        if self.tokens >= n:
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+    def take(self, n=1):
+        self._refill()
+        self.tokens -= n
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, fn):
+        """
+        Runs fn once per key at a time; concurrent callers with the
+        same key wait for and share the leader's result (or error).
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        user_rate=USER_RATE_PER_S,
+        user_burst=USER_BURST,
+        llm_rate=LLM_RATE_PER_S,
+        llm_burst=LLM_BURST,
+        sqlite_rate=SQLITE_RATE_PER_S,
+        sqlite_burst=SQLITE_BURST,
+        max_queue=MAX_QUEUE,
+        max_wait=MAX_QUEUE_WAIT_S,
+        clock=time.monotonic
+    ):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.clock = clock
+
+        self.global_buckets = {
+            "llm": TokenBucket(llm_rate, llm_burst, clock),
+            "sqlite": TokenBucket(sqlite_rate, sqlite_burst, clock)
+        }
+        self.user_buckets = {}
+
+        self._queue = []   # (-priority, seq, user_id)
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._flight = SingleFlight()
+        self._local = threading.local()
+
+        self._admitted = 0
+        self._rejected = 0
+        self._queue_waits = deque(maxlen=1000)
+
+    def _user_bucket(self, user_id):
+        bucket = self.user_buckets.get(user_id)
+        if bucket is None:
+            if len(self.user_buckets) >= MAX_TRACKED_USERS:
+                # A full bucket carries no state worth keeping
+                self.user_buckets = {
+                    uid: b for uid, b in self.user_buckets.items()
+                    if b.wait_time(b.capacity) > 0
+                }
+            bucket = TokenBucket(self.user_rate, self.user_burst, self.clock)
+            self.user_buckets[user_id] = bucket
+        return bucket
+
+    def _reject(self, message):
+        self._rejected += 1
+        raise AdmissionRejected(message)
+
+    def acquire(self, user_id, priority=0):
+        """
+        Admits one request for user_id: waits for a token from the user's
+        bucket, or rejects right away if that would take over max_wait.
+        """
+        with self._cond:
+            bucket = self._user_bucket(user_id)
+            user_wait = bucket.wait_time()
+            if user_wait > self.max_wait:
+                self._reject(
+                    f"❌ Query limit reached. Try again in {user_wait:.0f}s."
+                )
+
+            while user_wait > 0:
+                self._cond.wait(timeout=user_wait)
+                user_wait = bucket.wait_time()
+
+            bucket.take()
+            self._admitted += 1
+
+    def charge(self, resource, blocking=True):
+        """
+        Takes one token of global capacity ("llm" or "sqlite") right before
+        the work that uses it. Blocks until the bucket has a token and every
+        higher-priority waiter for it has been served; priority is the one
+        run() was called with. blocking=False returns False instead of
+        waiting (for optional work such as hedged requests).
+        """
+        bucket = self.global_buckets[resource]
+        priority = getattr(self._local, "priority", 0)
+
+        with self._cond:
+            if not blocking:
+                waiting = any(e[2] == resource for e in self._queue)
+                if waiting or bucket.wait_time() > 0:
+                    return False
+                bucket.take()
+                return True
+
+            if len(self._queue) >= self.max_queue:
+                self._reject("❌ The assistant is busy. Please try again shortly.")
+
+            entry = (-priority, next(self._seq), resource)
+            heapq.heappush(self._queue, entry)
+            enqueued = self.clock()
+            deadline = enqueued + self.max_wait
+
+            try:
+                while True:
+                    wait = bucket.wait_time()
+                    first = min(e for e in self._queue if e[2] == resource)
+
+                    if wait == 0 and first == entry:
+                        bucket.take()
+                        self._queue_waits.append(self.clock() - enqueued)
+                        return True
+
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self._reject("❌ The assistant is busy. Please try again shortly.")
+                    self._cond.wait(timeout=min(remaining, wait or remaining))
+            finally:
+                self._queue.remove(entry)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def run(self, user_id, key, fn, priority=0):
+        """
+        Admits user_id, then runs fn coalesced with identical in-flight
+        requests (same key). Every caller is admitted on its own, so a
+        follower never waits on, or fails with, the leader's user limit.
+        """
+        self.acquire(user_id, priority)
+
+        previous = getattr(self._local, "priority", 0)
+        self._local.priority = priority
+        try:
+            return self._flight.do(key, fn)
+        finally:
+            self._local.priority = previous
+
+    def metrics(self):
+        with self._cond:
+            waits = sorted(self._queue_waits)
+            queued = len(self._queue)
+
+        def pct(p):
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(p * len(waits)))] * 1000
+
+        return {
+            "admitted": self._admitted,
+            "rejected": self._rejected,
+            "coalesced": self._flight.coalesced,
+            "queued": queued,
+            "queue_wait_p50_ms": pct(0.50),
+            "queue_wait_p95_ms": pct(0.95),
+            "queue_wait_max_ms": waits[-1] * 1000 if waits else 0.0
+        }
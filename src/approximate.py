@@ -0,0 +1,386 @@
+"""
+Approximate answers for large aggregates over stratified sample tables.
+
+At build time every large table gets a `_sample_<table>` copy holding a
+Poisson sample of its rows: each stratum (state, year, category, ...) is
+sampled at SAMPLE_RATE, small strata at a higher rate so they keep at least
+MIN_STRATUM_ROWS rows. Every sampled row carries `_sample_weight`
+(1 / its inclusion probability).
+
+estimate_sql() rewrites an eligible aggregate query to read the sample of
+its largest table, scaling COUNT / SUM / AVG by the weights (Horvitz-Thompson),
+and adds a variance column per aggregate. add_confidence_intervals() turns
+those into `<column>_ci_low` / `<column>_ci_high` columns.
+"""
+
+import math
+import re
+from typing import NamedTuple, Optional
+
+from src.backends import _matching_paren, _split_args, referenced_tables, rewrite_calls
+
+SAMPLE_PREFIX = "_sample_"
+SAMPLE_MANIFEST_TABLE = "_sample_manifest"
+WEIGHT_COLUMN = "_sample_weight"
+
+SAMPLE_RATE = 0.05
+MIN_STRATUM_ROWS = 200
+# Below this a full scan is already fast
+MIN_SAMPLED_TABLE_ROWS = 50_000
+
+# table -> stratum expressions (evaluated on the table's own columns)
+SAMPLE_STRATA = {
+    "orders": ["order_status", "strftime('%Y', order_purchase_timestamp)"],
+    "order_items": ["strftime('%Y', shipping_limit_date)"],
+    "order_reviews": ["review_score", "strftime('%Y', review_creation_date)"],
+    "payments": ["payment_type"],
+    "customers": ["customer_state"],
+    "products": ["product_category_name"],
+    "geolocation": ["geolocation_state"],
+}
+
+CI_LOW_SUFFIX = "_ci_low"
+CI_HIGH_SUFFIX = "_ci_high"
+# 95% normal interval
+CI_Z = 1.96
+
+_HIDDEN_PREFIX = "__var_"
+# Sample tables have their own rowids, so rowid joins (full-text search) stay exact
+_UNSUPPORTED = re.compile(
+    r"\b(?:UNION|INTERSECT|EXCEPT|DISTINCT|MIN|MAX|OVER|MATCH|ROWID)\b", re.IGNORECASE
+)
+_SCALED_AGGREGATE = re.compile(r"\b(?:COUNT|SUM|AVG)\s*\(", re.IGNORECASE)
+_ALIAS = re.compile(r"^(.*?)\s+(?:AS\s+)?(\"[^\"]+\"|[A-Za-z_]\w*)$", re.IGNORECASE | re.DOTALL)
+
+_NOT_AN_ALIAS = {
+    "where", "join", "inner", "left", "right", "full", "cross", "natural", "on",
+    "using", "group", "order", "limit", "having", "window", "union",
+}
+
+
+class Estimate(NamedTuple):
+    sql: str
+    sample_table: str
+    # (output column, aggregate) for columns that get a confidence interval
+    intervals: list
+
+
+# ---------------- Build ----------------
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f'PRAGMA table_info("{table}")')}
+
+
+def _stratum_key(exprs):
+    return " || '|' || ".join(f"COALESCE(CAST({e} AS TEXT), '')" for e in exprs)
+
+
+def build_samples(conn, strata=None):
+    """
+    (Re)creates the sample tables and _sample_manifest.
+    Tables that are small or lack a stratum column are skipped.
+    """
+    strata = SAMPLE_STRATA if strata is None else strata
+
+    conn.execute(f"DROP TABLE IF EXISTS {SAMPLE_MANIFEST_TABLE}")
+    conn.execute(
+        f"CREATE TABLE {SAMPLE_MANIFEST_TABLE} "
+        "(table_name TEXT PRIMARY KEY, source_rows INTEGER, sample_rows INTEGER, strata TEXT)"
+    )
+
+    tables = {
+        name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    }
+
+    for table, exprs in strata.items():
+        conn.execute(f'DROP TABLE IF EXISTS "{SAMPLE_PREFIX}{table}"')
+        if table not in tables:
+            continue
+
+        source_rows = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        if source_rows < MIN_SAMPLED_TABLE_ROWS:
+            continue
+
+        # Every column the stratum expressions name must exist
+        bare = re.sub(r"'[^']*'", "", " ".join(exprs))
+        named = set(re.findall(r"\b[A-Za-z_]\w*\b(?!\s*\()", bare))
+        if not named <= _columns(conn, table):
+            continue
+
+        key = _stratum_key(exprs)
+        conn.execute(f"""
+            CREATE TABLE "{SAMPLE_PREFIX}{table}" AS
+            WITH keyed AS (SELECT *, {key} AS _stratum FROM "{table}"),
+            rates AS (
+                SELECT _stratum, MIN(1.0, MAX(?, ? * 1.0 / COUNT(*))) AS p
+                FROM keyed
+                GROUP BY _stratum
+            )
+            SELECT keyed.*, 1.0 / rates.p AS {WEIGHT_COLUMN}
+            FROM keyed JOIN rates USING (_stratum)
+            WHERE (random() & 1048575) < rates.p * 1048576
+        """, (SAMPLE_RATE, MIN_STRATUM_ROWS))
+
+        sample_rows = conn.execute(
+            f'SELECT COUNT(*) FROM "{SAMPLE_PREFIX}{table}"'
+        ).fetchone()[0]
+        conn.execute(
+            f"INSERT INTO {SAMPLE_MANIFEST_TABLE} VALUES (?, ?, ?, ?)",
+            (table, source_rows, sample_rows, ", ".join(exprs))
+        )
+        print(f"Sampled table: {table} ({sample_rows}/{source_rows} rows)")
+
+
+def update_sample(conn, table, rowids_sql, replaced_keys=None):
+    """
+    Samples the rows of `table` selected by rowids_sql (new or changed
+    rows) at the existing rate of their stratum; strata the sample has not
+    seen yet are kept whole until the next full build.
+    replaced_keys: (key columns, SQL selecting their values) of rows whose
+    previous version must leave the sample first.
+    """
+    if table not in read_sample_manifest(conn):
+        return
+
+    sample = f'"{SAMPLE_PREFIX}{table}"'
+    if replaced_keys:
+        columns, keys_sql = replaced_keys
+        conn.execute(
+            f"DELETE FROM {sample} WHERE ({', '.join(columns)}) IN ({keys_sql})"
+        )
+
+    conn.execute(f"""
+        INSERT INTO {sample}
+        SELECT keyed.*, 1.0 / COALESCE(rates.p, 1.0)
+        FROM (
+            SELECT *, {_stratum_key(SAMPLE_STRATA[table])} AS _stratum
+            FROM "{table}"
+            WHERE rowid IN ({rowids_sql})
+        ) keyed
+        LEFT JOIN (
+            SELECT _stratum, 1.0 / MIN({WEIGHT_COLUMN}) AS p
+            FROM {sample}
+            GROUP BY _stratum
+        ) rates USING (_stratum)
+        WHERE (random() & 1048575) < COALESCE(rates.p, 1.0) * 1048576
+    """)
+    conn.execute(f"""
+        UPDATE {SAMPLE_MANIFEST_TABLE}
+        SET source_rows = (SELECT COUNT(*) FROM "{table}"),
+            sample_rows = (SELECT COUNT(*) FROM {sample})
+        WHERE table_name = ?
+    """, (table,))
+
+
+def read_sample_manifest(conn) -> dict:
+    """
+    table -> source row count for every table that has a sample.
+    """
+    try:
+        rows = conn.execute(
+            f"SELECT table_name, source_rows FROM {SAMPLE_MANIFEST_TABLE}"
+        ).fetchall()
+    except Exception:
+        return {}
+    return dict(rows)
+
+
+# ---------------- Rewrite ----------------
+
+def _select_list(sql):
+    """
+    (start, end) of the SELECT list of a single-level query.
+    """
+    select = re.search(r"\bSELECT\b", sql, re.IGNORECASE)
+    from_ = re.search(r"\bFROM\b", sql[select.end():], re.IGNORECASE) if select else None
+    if not from_:
+        return None
+    return select.end(), select.end() + from_.start()
+
+
+def _split_alias(item):
+    """
+    "expr AS name" / "expr name" -> (expr, name); (item, None) otherwise.
+    """
+    m = _ALIAS.match(item.strip())
+    if m and m.group(2).lower() != "end" and re.search(r"[\w)\"]$", m.group(1)):
+        return m.group(1).strip(), m.group(2)
+    return item.strip(), None
+
+
+def _single_aggregate(expr):
+    """
+    (func, arg) when expr is COUNT/SUM/AVG(arg), optionally inside ROUND().
+    """
+    m = re.match(r"ROUND\s*\(", expr, re.IGNORECASE)
+    if m and _matching_paren(expr, m.end() - 1) == len(expr) - 1:
+        expr = _split_args(expr[m.end():-1])[0]
+
+    m = re.match(r"(COUNT|SUM|AVG)\s*\(", expr, re.IGNORECASE)
+    if not m or _matching_paren(expr, m.end() - 1) != len(expr) - 1:
+        return None
+    return m.group(1).upper(), expr[m.end():-1].strip()
+
+
+def _swap_table(sql, table):
+    """
+    FROM/JOIN table [alias] -> FROM/JOIN _sample_table alias.
+    The original name is kept as the alias so qualified columns still resolve.
+    """
+    pattern = re.compile(
+        rf"\b(FROM|JOIN)\s+{re.escape(table)}\b(\s+(?:AS\s+)?([A-Za-z_]\w*))?",
+        re.IGNORECASE
+    )
+
+    def swap(m):
+        alias = m.group(3)
+        if alias and alias.lower() not in _NOT_AN_ALIAS:
+            return f"{m.group(1)} {SAMPLE_PREFIX}{table} AS {alias}"
+        return f"{m.group(1)} {SAMPLE_PREFIX}{table} AS {table}{m.group(2) or ''}"
+
+    return pattern.sub(swap, sql, count=1)
+
+
+def _weighted_count(args):
+    if args == ["*"]:
+        return f"CAST(ROUND(TOTAL({WEIGHT_COLUMN})) AS INTEGER)"
+    if len(args) != 1:
+        return None
+    return f"CAST(ROUND(TOTAL(CASE WHEN ({args[0]}) IS NOT NULL THEN {WEIGHT_COLUMN} END)) AS INTEGER)"
+
+
+def _weighted_sum(args):
+    if len(args) != 1:
+        return None
+    return f"SUM({WEIGHT_COLUMN} * ({args[0]}))"
+
+
+def _weighted_avg(args):
+    if len(args) != 1:
+        return None
+    return (
+        f"(SUM({WEIGHT_COLUMN} * ({args[0]})) / "
+        f"SUM(CASE WHEN ({args[0]}) IS NOT NULL THEN {WEIGHT_COLUMN} END))"
+    )
+
+
+def rewrite_aggregates(sql):
+    # SUM first: the COUNT / AVG rewrites emit SUM calls of their own
+    sql = rewrite_calls(sql, "SUM", _weighted_sum)
+    sql = rewrite_calls(sql, "COUNT", _weighted_count)
+    return rewrite_calls(sql, "AVG", _weighted_avg)
+
+
+def _variance(func, arg):
+    """
+    Estimated variance of the weighted aggregate under Poisson sampling:
+    sum of w * (w - 1) * y^2 over sampled rows (linearized for AVG).
+    """
+    w = WEIGHT_COLUMN
+    f = f"{w} * ({w} - 1)"
+    if func == "COUNT":
+        if arg == "*":
+            return f"TOTAL({f})"
+        return f"TOTAL(CASE WHEN ({arg}) IS NOT NULL THEN {f} END)"
+    if func == "SUM":
+        return f"TOTAL({f} * ({arg}) * ({arg}))"
+
+    # AVG = Y / N; residuals y - R with R = Y / N
+    y_total = f"TOTAL({w} * ({arg}))"
+    n_total = f"TOTAL(CASE WHEN ({arg}) IS NOT NULL THEN {w} END)"
+    ratio = f"({y_total} / {n_total})"
+    return (
+        f"((TOTAL({f} * ({arg}) * ({arg}))"
+        f" - 2 * {ratio} * TOTAL({f} * ({arg}))"
+        f" + {ratio} * {ratio} * TOTAL(CASE WHEN ({arg}) IS NOT NULL THEN {f} END))"
+        f" / ({n_total} * {n_total}))"
+    )
+
+
+def estimate_sql(sql, sampled: dict) -> Optional[Estimate]:
+    """
+    Rewrites an aggregate query to run on a sample table, or returns None
+    when the query is not eligible: it must be a single SELECT (no
+    subqueries, CTEs or set operations) using only COUNT / SUM / AVG, and
+    read a sampled table exactly once. Every aggregate in the SELECT list
+    must be a plain (optionally ROUNDed) COUNT / SUM / AVG: the answer is
+    only recognizable as an estimate by its confidence-interval columns.
+    sampled: table -> source row count (read_sample_manifest).
+    """
+    sql = sql.strip().rstrip(";")
+
+    if len(re.findall(r"\bSELECT\b", sql, re.IGNORECASE)) != 1:
+        return None
+    if _UNSUPPORTED.search(sql) or not _SCALED_AGGREGATE.search(sql):
+        return None
+
+    refs = [t for t in re.findall(r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)", sql, re.IGNORECASE)]
+    candidates = [
+        t for t in referenced_tables(sql)
+        if t in sampled and refs.count(t) == 1
+    ]
+    if not candidates:
+        return None
+    table = max(candidates, key=lambda t: sampled[t])
+
+    bounds = _select_list(sql)
+    if bounds is None:
+        return None
+    start, end = bounds
+
+    items, intervals, hidden = [], [], []
+    for item in _split_args(sql[start:end]):
+        expr, alias = _split_alias(item)
+        if not _SCALED_AGGREGATE.search(expr):
+            items.append(item)
+            continue
+
+        # COUNT(*) * 100.0 / 1000, SUM(x) / COUNT(*): no interval, so no estimate
+        aggregate = _single_aggregate(expr)
+        if aggregate is None:
+            return None
+        func, arg = aggregate
+
+        # Name the column so the rewritten expression doesn't become its label
+        name = alias.strip('"') if alias else expr
+        items.append(f'{rewrite_aggregates(expr)} AS "{name}"')
+        intervals.append((name, func))
+        hidden.append(f'{_variance(func, arg)} AS "{_HIDDEN_PREFIX}{len(hidden)}"')
+
+    select_list = "\n    " + ",\n    ".join(items + hidden) + "\n"
+    rest = rewrite_aggregates(sql[end:])
+
+    rewritten = sql[:start] + select_list + _swap_table(rest, table)
+    return Estimate(rewritten, table, intervals)
+
+
+def add_confidence_intervals(estimate: Estimate, cols, rows):
+    """
+    Replaces the hidden variance columns with <col>_ci_low / <col>_ci_high.
+    """
+    n_hidden = len(estimate.intervals)
+    visible = list(cols[:len(cols) - n_hidden])
+
+    out_cols = visible + [
+        f"{name}{suffix}"
+        for name, _ in estimate.intervals
+        for suffix in (CI_LOW_SUFFIX, CI_HIGH_SUFFIX)
+    ]
+
+    out_rows = []
+    for row in rows:
+        values = list(row[:len(visible)])
+        for (name, _), variance in zip(estimate.intervals, row[len(visible):]):
+            value = row[visible.index(name)]
+            if not isinstance(value, (int, float)) or variance is None:
+                values += [None, None]
+                continue
+            margin = CI_Z * math.sqrt(max(variance, 0.0))
+            values += [value - margin, value + margin]
+        out_rows.append(tuple(values))
+
+    return out_cols, out_rows
+
+
+def is_estimate(cols) -> bool:
+    return any(str(c).endswith(CI_LOW_SUFFIX) for c in cols)
@@ -0,0 +1,590 @@
+"""
+Execution backends for the GenAI SQL engine.
+
+SQLite is the system of record: the generator prompt targets its dialect and
+every query can run there. DuckDB is an optional embedded columnar engine
+that scans Parquet copies of the SQLite tables with vectorized,
+multi-threaded operators, which is much faster for full-table aggregates.
+
+route_query() picks a backend per query from the SQLite query plan, and
+to_duckdb_sql() translates the SQLite-isms the prompt asks for.
+"""
+
+import json
+import os
+import queue
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from src import snapshot
+from src import spatial, text_search
+
+# Read path is memory-mapped instead of copied through the page cache
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+
+# Upper bound on concurrent read connections per backend
+SQLITE_POOL_SIZE = 8
+
+# DuckDB settings that make it answer like SQLite:
+# 5/2 = 2, and NULL sorts as the smallest value
+DUCKDB_SQLITE_SEMANTICS = {
+    "integer_division": True,
+    "default_null_order": "nulls_first_on_asc_last_on_desc",
+}
+
+
+class SQLitePool:
+    """
+    Bounded pool of read-only connections shared across threads.
+    Callers beyond `size` block until a connection is returned.
+    """
+
+    def __init__(self, db_path: Path, size=SQLITE_POOL_SIZE):
+        self.db_path = Path(db_path)
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    def _open(self):
+        conn = sqlite3.connect(
+            f"file:{self.db_path.as_posix()}?mode=ro",
+            uri=True,
+            check_same_thread=False
+        )
+        conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        spatial.register_functions(conn)
+        return conn
+
+    def acquire(self, timeout=None):
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("no idle SQLite connection")
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            try:
+                return self._open()
+            except Exception:
+                self._slots.release()
+                raise
+
+    def release(self, conn):
+        self._idle.put(conn)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.acquire(timeout)
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close_all(self):
+        """
+        Drops idle connections, e.g. after the database file was replaced.
+        """
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+class SQLiteBackend:
+    name = "sqlite"
+
+    def __init__(self, db_path: Path, csv_dir: Path, snapshot_dir: Path = None):
+        self.db_path = Path(db_path)
+        self.csv_dir = Path(csv_dir)
+        self.snapshot_dir = Path(snapshot_dir) if snapshot_dir else None
+        self.pool = SQLitePool(self.db_path)
+
+    def connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        spatial.register_functions(conn)
+        return conn
+
+    def initialize(self):
+        """
+        Makes sure target.db reflects the current CSVs, cheapest path first:
+        1. target.db was built from identical CSVs -> nothing to do
+        2. target.db is of the current format      -> apply the changed CSVs
+                                                      in place (src.refresh)
+        3. a prebuilt snapshot matches             -> copy it
+        4. otherwise                               -> parse the CSVs
+        Changed CSVs may be partial drops, so an existing database is never
+        rebuilt from them: that would drop every row the drop leaves out.
+        """
+        hashes = snapshot.csv_hashes(self.csv_dir)
+        manifest = snapshot.read_db_manifest(self.db_path)
+
+        if manifest == hashes:
+            return  # DB already up to date, do nothing
+
+        # Pooled connections would keep reading the replaced file
+        self.pool.close_all()
+
+        if manifest.get("_build_format") == hashes["_build_format"]:
+            from src.refresh import refresh_database  # imports this module
+
+            if refresh_database(self.db_path, self.csv_dir) is not None:
+                return
+
+        if self.snapshot_dir and snapshot.restore_snapshot(
+            self.snapshot_dir, self.db_path, hashes
+        ):
+            print("Database restored from snapshot.")
+            return
+
+        print("Creating database from CSV files...")
+        snapshot.build_sqlite(self.csv_dir, self.db_path, hashes)
+        print("Database creation complete.")
+
+    def load_schema(self):
+        with self.pool.connection() as conn:
+            return self._load_schema(conn)
+
+    def _load_schema(self, conn):
+        cursor = conn.cursor()
+
+        # Underscore / sqlite_ tables are bookkeeping, not data
+        cursor.execute("""
+            SELECT name, sql
+            FROM sqlite_master
+            WHERE type='table'
+              AND name NOT LIKE '\\_%' ESCAPE '\\'
+              AND name NOT LIKE 'sqlite\\_%' ESCAPE '\\'
+        """)
+
+        # Internal storage of virtual tables (R*Tree nodes, FTS segments)
+        try:
+            shadow = {
+                row[1] for row in conn.execute("PRAGMA table_list")
+                if row[2] == "shadow"
+            }
+        except sqlite3.Error:
+            shadow = set()
+
+        schema_text = ""
+        tables = set()
+        for table_name, table_sql in cursor.fetchall():
+            if table_name in shadow:
+                continue
+            tables.add(table_name)
+            schema_text += f"\n-- {table_name}\n{table_sql}\n"
+
+        if spatial.CENTROIDS_TABLE in tables:
+            schema_text += spatial.SCHEMA_NOTES
+        if text_search.FTS_TABLE in tables:
+            schema_text += text_search.SCHEMA_NOTES
+
+        return schema_text
+
+    def data_version(self):
+        """
+        PRAGMA user_version: changes whenever the data is rebuilt or refreshed.
+        """
+        with self.pool.connection() as conn:
+            return conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def table_versions(self, tables):
+        """
+        Sorted (table, version) pairs for the given tables, or None if any
+        of them has no recorded version (callers then use data_version()).
+        """
+        try:
+            with self.pool.connection() as conn:
+                versions = dict(conn.execute(
+                    f"SELECT table_name, version FROM {snapshot.VERSIONS_TABLE}"
+                ).fetchall())
+        except sqlite3.Error:
+            return None
+
+        pairs = []
+        for table in sorted(tables):
+            version = versions.get(snapshot.source_table(table))
+            if version is None:
+                return None
+            pairs.append((table, version))
+        return tuple(pairs)
+
+    def table_names(self):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table'"
+            ).fetchall()
+        return {name for (name,) in rows}
+
+    def sample_tables(self):
+        """
+        Tables with a stratified sample -> their full row count.
+        """
+        from src.approximate import read_sample_manifest
+
+        with self.pool.connection() as conn:
+            return read_sample_manifest(conn)
+
+    def query_plan(self, sql, raise_errors=False):
+        """
+        Returns the EXPLAIN QUERY PLAN detail lines, or [] if SQLite
+        cannot plan the query (the error surfaces again on execute).
+        """
+        try:
+            with self.pool.connection() as conn:
+                rows = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        except sqlite3.Error as e:
+            if raise_errors:
+                raise RuntimeError(f"SQL execution failed: {e}")
+            return []
+        return [row[-1] for row in rows]
+
+    def execute(self, sql):
+        with self.pool.connection() as conn:
+            cursor = conn.cursor()
+
+            try:
+                cursor.execute(sql)
+                rows = cursor.fetchall()
+                col_names = [d[0] for d in cursor.description] if cursor.description else []
+            except Exception as e:
+                raise RuntimeError(f"SQL execution failed: {e}")
+            finally:
+                cursor.close()
+
+        return col_names, rows
+
+    def iterate(self, sql, batch_size=1000, timeout=None):
+        """
+        Yields the column names, then batches of rows, holding one pooled
+        connection until the caller is done. Raises TimeoutError if no
+        connection frees up within timeout seconds.
+        """
+        with self.pool.connection(timeout) as conn:
+            cursor = conn.cursor()
+            try:
+                try:
+                    cursor.execute(sql)
+                except Exception as e:
+                    raise RuntimeError(f"SQL execution failed: {e}")
+
+                yield [d[0] for d in cursor.description] if cursor.description else []
+                while True:
+                    batch = cursor.fetchmany(batch_size)
+                    if not batch:
+                        return
+                    yield batch
+            finally:
+                cursor.close()
+
+
+class DuckDBBackend:
+    """
+    In-process DuckDB over Parquet snapshots of the SQLite source tables.
+    One Parquet file per table, exposed to queries as a view.
+    """
+
+    name = "duckdb"
+    EXPORT_MANIFEST = "_versions.json"
+
+    def __init__(self, parquet_dir: Path, db_path: Path):
+        self.parquet_dir = Path(parquet_dir)
+        self.db_path = Path(db_path)
+        self._conn = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available():
+        try:
+            import duckdb  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def initialize(self):
+        """
+        Exports every source table of target.db whose version (see
+        snapshot.VERSIONS_TABLE) differs from the one last exported.
+        Reading SQLite rather than the CSVs keeps both backends on the
+        same rows after an incremental refresh.
+        """
+        import duckdb
+        import pandas as pd
+
+        self.parquet_dir.mkdir(parents=True, exist_ok=True)
+        manifest_path = self.parquet_dir / self.EXPORT_MANIFEST
+        exported = json.loads(manifest_path.read_text()) if manifest_path.exists() else {}
+
+        source = sqlite3.connect(f"file:{self.db_path.as_posix()}?mode=ro", uri=True)
+        conn = duckdb.connect()
+        try:
+            versions = dict(source.execute(
+                f"SELECT table_name, version FROM {snapshot.VERSIONS_TABLE}"
+            ))
+
+            for parquet_file in self.parquet_dir.glob("*.parquet"):
+                if parquet_file.stem not in versions:
+                    parquet_file.unlink()
+                    exported.pop(parquet_file.stem, None)
+
+            for table, version in sorted(versions.items()):
+                target = self.parquet_dir / f"{table}.parquet"
+                if target.exists() and exported.get(table) == version:
+                    continue
+
+                # Nullable dtypes keep INTEGER columns with NULLs integral
+                df = pd.read_sql_query(
+                    f'SELECT * FROM "{table}"', source, dtype_backend="numpy_nullable"
+                )
+                conn.register("source_table", df)
+                conn.execute(
+                    f"COPY source_table TO '{target.as_posix()}' "
+                    "(FORMAT PARQUET, COMPRESSION ZSTD)"
+                )
+                conn.unregister("source_table")
+                exported[table] = version
+                print(f"Wrote parquet: {target.name}")
+        finally:
+            conn.close()
+            source.close()
+
+        manifest_path.write_text(json.dumps(exported, indent=2))
+
+        # Views are created per file; pick up added or removed tables
+        with self._lock:
+            self._conn = None
+
+    def _connection(self):
+        with self._lock:
+            if self._conn is None:
+                import duckdb
+
+                conn = duckdb.connect(config={
+                    "threads": os.cpu_count() or 1,
+                    **DUCKDB_SQLITE_SEMANTICS
+                })
+                for parquet_file in sorted(self.parquet_dir.glob("*.parquet")):
+                    conn.execute(
+                        f'CREATE VIEW "{parquet_file.stem}" AS '
+                        f"SELECT * FROM read_parquet('{parquet_file.as_posix()}')"
+                    )
+                self._conn = conn
+            return self._conn
+
+    def table_names(self):
+        return {p.stem for p in self.parquet_dir.glob("*.parquet")}
+
+    def can_execute(self, sql):
+        """
+        True when every table the query reads has a Parquet copy and it
+        calls no SQLite-only functions (or date functions in a form the
+        shim cannot translate).
+        """
+        if _SQLITE_ONLY.search(sql) or not _translatable_dates(sql):
+            return False
+        tables = self.table_names()
+        return bool(tables) and referenced_tables(sql) <= tables
+
+    def execute(self, sql):
+        # Cursors on a shared DuckDB connection are safe to use per thread
+        cursor = self._connection().cursor()
+
+        try:
+            cursor.execute(to_duckdb_sql(sql))
+            rows = cursor.fetchall()
+            col_names = [d[0] for d in cursor.description] if cursor.description else []
+        except Exception as e:
+            raise RuntimeError(f"SQL execution failed: {e}")
+        finally:
+            cursor.close()
+
+        return col_names, rows
+
+
+# ---------------- Query inspection ----------------
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)", re.IGNORECASE)
+_CTE_NAME = re.compile(r"(?:\bWITH|,)\s*([A-Za-z_]\w*)\s+AS\s*\(", re.IGNORECASE)
+_AGGREGATE = re.compile(r"\b(?:COUNT|SUM|AVG|MIN|MAX)\s*\(|\bGROUP\s+BY\b", re.IGNORECASE)
+# Functions registered on SQLite connections only, and SQLite date
+# functions without a DuckDB translation (date() would return DATE, not TEXT)
+_SQLITE_ONLY = re.compile(
+    r"\b(?:haversine_km|km_lat_delta|km_lng_delta|date|datetime|time|unixepoch)\s*\(",
+    re.IGNORECASE
+)
+_NOW = re.compile(r"^'now'$", re.IGNORECASE)
+
+
+def referenced_tables(sql):
+    """
+    Base tables named after FROM / JOIN, excluding CTE names.
+    """
+    ctes = {name.lower() for name in _CTE_NAME.findall(sql)}
+    return {
+        name for name in _TABLE_REF.findall(sql)
+        if name.lower() not in ctes
+    }
+
+
+def is_analytic_plan(sql, plan):
+    """
+    Aggregates over full table scans are where a columnar engine wins.
+    Index lookups (SEARCH) and non-aggregate queries stay on SQLite.
+    """
+    if not _AGGREGATE.search(sql):
+        return False
+    return any(detail.startswith("SCAN ") for detail in plan)
+
+
+def route_query(sql, sqlite_backend, duckdb_backend=None, mode="auto"):
+    """
+    Picks the backend for one query.
+    mode: "sqlite", "duckdb" or "auto" (decide from the SQLite plan).
+    """
+    if duckdb_backend is None or mode == "sqlite":
+        return sqlite_backend
+
+    if not duckdb_backend.can_execute(sql):
+        return sqlite_backend
+
+    if mode == "duckdb":
+        return duckdb_backend
+
+    plan = sqlite_backend.query_plan(sql)
+    if is_analytic_plan(sql, plan):
+        return duckdb_backend
+    return sqlite_backend
+
+
+# ---------------- SQLite → DuckDB dialect shim ----------------
+
+def _split_args(text):
+    """
+    Splits a function argument list on top-level commas,
+    respecting nested parentheses and quoted strings.
+    """
+    args, depth, quote, start = [], 0, None, 0
+    for i, ch in enumerate(text):
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            args.append(text[start:i].strip())
+            start = i + 1
+    args.append(text[start:].strip())
+    return args
+
+
+def _matching_paren(sql, open_idx):
+    depth, quote = 0, None
+    for i in range(open_idx, len(sql)):
+        ch = sql[i]
+        if quote:
+            if ch == quote:
+                quote = None
+        elif ch in "'\"":
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+            if depth == 0:
+                return i
+    raise ValueError("Unbalanced parentheses in SQL")
+
+
+def rewrite_calls(sql, func_name, rewrite):
+    """
+    Replaces every call func_name(...) with rewrite(args), innermost first.
+    rewrite returns None to keep a call unchanged.
+    """
+    pattern = re.compile(rf"\b{func_name}\s*\(", re.IGNORECASE)
+    out, pos = [], 0
+
+    while True:
+        match = pattern.search(sql, pos)
+        if not match:
+            out.append(sql[pos:])
+            return "".join(out)
+
+        open_idx = match.end() - 1
+        close_idx = _matching_paren(sql, open_idx)
+        inner = rewrite_calls(sql[open_idx + 1:close_idx], func_name, rewrite)
+        replacement = rewrite(_split_args(inner))
+
+        out.append(sql[pos:match.start()])
+        if replacement is None:
+            out.append(f"{match.group(0)}{inner})")
+        else:
+            out.append(replacement)
+        pos = close_idx + 1
+
+
+def _strftime(args):
+    # SQLite: strftime(format, value)  DuckDB: strftime(timestamp, format)
+    if len(args) != 2:
+        return None
+    fmt, value = args
+    return f"strftime(CAST({value} AS TIMESTAMP), {fmt})"
+
+
+def _julianday(args):
+    # DuckDB's julian() counts days from midnight, SQLite's from noon
+    if len(args) != 1:
+        return None
+    return f"(julian(CAST({args[0]} AS TIMESTAMP)) - 0.5)"
+
+
+_QUOTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_LIKE = re.compile(r"\bLIKE\b", re.IGNORECASE)
+
+
+def _rewrite_unquoted(sql, pattern, replacement):
+    """
+    pattern.sub outside string literals and quoted identifiers.
+    """
+    out, pos = [], 0
+    for quoted in _QUOTED.finditer(sql):
+        out.append(pattern.sub(replacement, sql[pos:quoted.start()]))
+        out.append(quoted.group(0))
+        pos = quoted.end()
+    out.append(pattern.sub(replacement, sql[pos:]))
+    return "".join(out)
+
+
+def _translatable_dates(sql):
+    """
+    False when strftime / julianday are called with modifiers
+    ('start of month', '+1 day') or 'now', which the shim leaves as is.
+    """
+    shapes = {"strftime": 2, "julianday": 1}
+    ok = True
+
+    for func, n_args in shapes.items():
+        def check(args, n_args=n_args):
+            nonlocal ok
+            if len(args) != n_args or _NOW.match(args[-1]):
+                ok = False
+            return None
+
+        rewrite_calls(sql, func, check)
+    return ok
+
+
+def to_duckdb_sql(sql):
+    """
+    Translates the SQLite functions the generator prompt asks for.
+    SQLite's LIKE ignores case; DuckDB's ILIKE is the equivalent.
+    """
+    sql = rewrite_calls(sql, "strftime", _strftime)
+    sql = rewrite_calls(sql, "julianday", _julianday)
+    sql = _rewrite_unquoted(sql, _LIKE, "ILIKE")
+    return sql.strip().rstrip(";")
@@ -0,0 +1,97 @@
+"""
+Benchmarks the SQLite and DuckDB backends on the queries in eda.sql.
+
+Usage (from the repo root):
+    python -m src.bench_backends [--repeat 5]
+"""
+
+import argparse
+import re
+import time
+from pathlib import Path
+
+from src.backends import is_analytic_plan
+from src.genai_sql_engine import initialize_database, get_backend, duckdb_enabled
+
+EDA_PATH = Path("eda.sql")
+
+
+def load_eda_queries(path=EDA_PATH):
+    """
+    Returns (label, sql) for every SELECT / WITH statement in eda.sql,
+    with the ATTACH-ed `target.` schema prefix removed.
+    """
+    queries = []
+    label = ""
+    lines = []
+
+    for line in path.read_text(encoding="utf-8").splitlines():
+        stripped = line.strip()
+        if stripped.startswith("--"):
+            heading = re.match(r"--\s*(\d+\.[A-Z])\b", stripped)
+            if heading:
+                label = heading.group(1)
+            continue
+        lines.append(line)
+
+        if stripped.endswith(";"):
+            sql = "\n".join(lines).strip().rstrip(";")
+            lines = []
+            if sql.upper().startswith(("SELECT", "WITH")):
+                queries.append((label, sql.replace("target.", "")))
+
+    return queries
+
+
+def time_query(backend, sql, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        backend.execute(sql)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    initialize_database()
+
+    sqlite_backend = get_backend("sqlite")
+    duckdb_backend = get_backend("duckdb") if duckdb_enabled() else None
+
+    if duckdb_backend is None:
+        print("DuckDB is not installed (pip install duckdb); timing SQLite only.")
+
+    print(f"{'query':<8}{'sqlite ms':>12}{'duckdb ms':>12}{'speedup':>10}  routed")
+
+    for label, sql in load_eda_queries():
+        try:
+            sqlite_s = time_query(sqlite_backend, sql, args.repeat)
+        except RuntimeError as e:
+            print(f"{label:<8}{'skipped':>12}  {e}")
+            continue
+
+        duckdb_s = None
+        if duckdb_backend is not None and duckdb_backend.can_execute(sql):
+            duckdb_s = time_query(duckdb_backend, sql, args.repeat)
+
+        plan = sqlite_backend.query_plan(sql)
+        analytic = duckdb_s is not None and is_analytic_plan(sql, plan)
+        routed = "duckdb" if analytic else "sqlite"
+
+        if duckdb_s is None:
+            print(f"{label:<8}{sqlite_s * 1000:>12.2f}{'-':>12}{'-':>10}  {routed}")
+        else:
+            speedup = sqlite_s / duckdb_s if duckdb_s else float("inf")
+            print(
+                f"{label:<8}{sqlite_s * 1000:>12.2f}{duckdb_s * 1000:>12.2f}"
+                f"{speedup:>9.1f}x  {routed}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Measures database cold start: CSV parse vs snapshot restore vs warm check.
+
+Each scenario runs against a scratch copy of data/csv so target.db and
+data/snapshot are left untouched.
+
+Usage (from the repo root):
+    python -m src.bench_cold_start [--repeat 3]
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+from src.backends import SQLiteBackend
+from src.snapshot import build_snapshot
+
+CSV_DIR = Path("data/csv")
+
+
+def timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    results = {"csv parse": [], "snapshot restore": [], "warm (hashes match)": []}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        csv_dir = tmp / "csv"
+        shutil.copytree(CSV_DIR, csv_dir)
+        build_snapshot(csv_dir, tmp / "snapshot")
+
+        for i in range(args.repeat):
+            no_snapshot = SQLiteBackend(tmp / f"cold_{i}.db", csv_dir)
+            results["csv parse"].append(timed(no_snapshot.initialize))
+
+            with_snapshot = SQLiteBackend(tmp / f"restore_{i}.db", csv_dir, tmp / "snapshot")
+            results["snapshot restore"].append(timed(with_snapshot.initialize))
+            results["warm (hashes match)"].append(timed(with_snapshot.initialize))
+
+    print(f"\n{'scenario':<22}{'best ms':>10}{'mean ms':>10}")
+    for scenario, times in results.items():
+        print(
+            f"{scenario:<22}{min(times) * 1000:>10.1f}"
+            f"{sum(times) / len(times) * 1000:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Coverage and latency report for the intent fast path over a question corpus.
+
+Usage (from the repo root):
+    python -m src.bench_fast_path [--corpus data/questions.txt] [--show-unmatched]
+"""
+
+import argparse
+import time
+from collections import Counter
+from pathlib import Path
+
+from src.genai_sql_engine import initialize_database, try_fast_path
+from src.intent_router import match_intent
+
+CORPUS_PATH = Path("data/questions.txt")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", type=Path, default=CORPUS_PATH)
+    parser.add_argument("--show-unmatched", action="store_true")
+    args = parser.parse_args()
+
+    questions = [
+        line.strip() for line in args.corpus.read_text(encoding="utf-8").splitlines()
+        if line.strip() and not line.startswith("#")
+    ]
+
+    initialize_database()
+
+    intents = Counter()
+    match_us, answer_ms = [], []
+    unmatched, unanswerable = [], []
+
+    for question in questions:
+        start = time.perf_counter()
+        match = match_intent(question)
+        match_us.append((time.perf_counter() - start) * 1e6)
+
+        if match is None:
+            unmatched.append(question)
+            continue
+        intents[match.intent] += 1
+
+        start = time.perf_counter()
+        answered = try_fast_path(question)
+        if answered is None:
+            unanswerable.append(question)
+        else:
+            answer_ms.append((time.perf_counter() - start) * 1000)
+
+    matched = len(questions) - len(unmatched)
+    print(f"Questions:       {len(questions)}")
+    print(f"Matched:         {matched} ({matched / len(questions):.0%})")
+    print(f"Answered here:   {len(answer_ms)} (others need tables missing from target.db)")
+    for intent, count in intents.most_common():
+        print(f"  {intent:<22}{count}")
+
+    print(f"\nMatch latency    p50 {percentile(match_us, 0.5):.1f} us, p95 {percentile(match_us, 0.95):.1f} us")
+    if answer_ms:
+        print(f"Answer latency   p50 {percentile(answer_ms, 0.5):.2f} ms, p95 {percentile(answer_ms, 0.95):.2f} ms")
+    print("LLM tokens spent on matched questions: 0")
+
+    if args.show_unmatched:
+        print("\nUnmatched (sent to generate_sql):")
+        for question in unmatched:
+            print(f"  - {question}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Import-time benchmark for the engine, based on `python -X importtime`.
+
+Usage (from the repo root):
+    python -m src.bench_import_time [module] [--top 15]
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+
+# Cumulative import budget for src.genai_sql_engine, enforced in tests
+IMPORT_BUDGET_MS = 150
+
+# Must not be imported until an LLM call or ingestion actually happens
+DEFERRED_MODULES = ("openai", "pandas", "duckdb", "numpy")
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure_import(module="src.genai_sql_engine"):
+    """
+    Imports `module` in a fresh interpreter and returns
+    {module name: (self_us, cumulative_us)} for everything it pulled in.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    timings = {}
+    for line in result.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, _, name = match.groups()
+            timings[name] = (int(self_us), int(cumulative_us))
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("module", nargs="?", default="src.genai_sql_engine")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = measure_import(args.module)
+    total_ms = timings[args.module][1] / 1000
+
+    print(f"{args.module}: {total_ms:.1f} ms cumulative (budget {IMPORT_BUDGET_MS} ms)")
+    print(f"\n{'module':<50}{'self ms':>10}{'cum ms':>10}")
+
+    slowest = sorted(timings.items(), key=lambda kv: kv[1][1], reverse=True)
+    for name, (self_us, cumulative_us) in slowest[:args.top]:
+        print(f"{name:<50}{self_us / 1000:>10.1f}{cumulative_us / 1000:>10.1f}")
+
+    loaded = [m for m in DEFERRED_MODULES if m in timings]
+    if loaded:
+        print(f"\nWARNING: heavy modules imported eagerly: {', '.join(loaded)}")
+
+
+if __name__ == "__main__":
+    main()
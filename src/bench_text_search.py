@@ -0,0 +1,89 @@
+"""
+Benchmarks review text search: LIKE '%...%' scans vs the FTS5 index.
+
+Usage (from the repo root):
+    python -m src.bench_text_search [--repeat 5]
+"""
+
+import argparse
+import time
+
+from src.genai_sql_engine import initialize_database, get_backend
+from src.text_search import FTS_TABLE
+
+# label -> (LIKE query, FTS5 query); counts differ slightly because LIKE
+# matches substrings and is accent-sensitive
+QUERIES = {
+    "late delivery": (
+        """SELECT COUNT(*) FROM order_reviews
+        WHERE review_comment_message LIKE '%atras%' OR review_comment_title LIKE '%atras%'""",
+        f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH 'atras*'",
+    ),
+    "not received": (
+        """SELECT COUNT(*) FROM order_reviews
+        WHERE review_comment_message LIKE '%nao recebi%'
+           OR review_comment_message LIKE '%não recebi%'""",
+        f"""SELECT COUNT(*) FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH 'review_comment_message : "nao recebi"'""",
+    ),
+    "defect AND product": (
+        """SELECT COUNT(*) FROM order_reviews
+        WHERE review_comment_message LIKE '%defeito%' AND review_comment_message LIKE '%produto%'""",
+        f"SELECT COUNT(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH 'defeito AND produto'",
+    ),
+    "top 20 recommend": (
+        """SELECT review_id, review_score FROM order_reviews
+        WHERE review_comment_message LIKE '%recomendo%'
+        ORDER BY review_score DESC
+        LIMIT 20""",
+        f"""SELECT r.review_id, r.review_score
+        FROM {FTS_TABLE} f JOIN order_reviews r ON r.rowid = f.rowid
+        WHERE {FTS_TABLE} MATCH 'recomendo'
+        ORDER BY bm25({FTS_TABLE})
+        LIMIT 20""",
+    ),
+}
+
+
+def time_query(backend, sql, repeat):
+    best, rows = None, []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, rows = backend.execute(sql)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def summarize(rows):
+    if len(rows) == 1 and len(rows[0]) == 1:
+        return str(rows[0][0])
+    return f"{len(rows)} rows"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    initialize_database()
+    backend = get_backend("sqlite")
+
+    if FTS_TABLE not in backend.table_names():
+        print("order_reviews is not loaded (or has no text columns); nothing to benchmark.")
+        return
+
+    print(f"{'query':<20}{'like ms':>10}{'fts ms':>10}{'speedup':>10}  {'like':>10}{'fts':>10}")
+
+    for label, (like_sql, fts_sql) in QUERIES.items():
+        like_s, like_rows = time_query(backend, like_sql, args.repeat)
+        fts_s, fts_rows = time_query(backend, fts_sql, args.repeat)
+        speedup = like_s / fts_s if fts_s else float("inf")
+        print(
+            f"{label:<20}{like_s * 1000:>10.2f}{fts_s * 1000:>10.2f}{speedup:>9.1f}x"
+            f"  {summarize(like_rows):>10}{summarize(fts_rows):>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Cache of explain_result output keyed on the result itself.
+
+The key is (normalized question, column names, streaming hash of every
+row), so a repeat question from any session that produced a byte-identical
+result reuses the explanation instead of another LLM call. Entries are
+bounded (LRU) and each remembers the data version it was computed at (the
+versions of the tables its query read), so a refresh of one table only
+drops the entries that depended on it.
+
+get_latest() serves the most recent explanation for a question regardless
+of the result, as a fallback when the LLM is unavailable.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+MAX_ENTRIES = 512
+
+
+def result_fingerprint(question: str, cols, rows) -> str:
+    h = hashlib.sha256()
+    h.update(question.encode("utf-8"))
+    h.update(b"\x1e")
+    h.update("\x1f".join(cols).encode("utf-8"))
+    for row in rows:
+        h.update(b"\x1e")
+        h.update(repr(row).encode("utf-8"))
+    return h.hexdigest()
+
+
+class ExplanationCache:
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self._entries = OrderedDict()
+        self._latest = {}   # question -> key of its newest entry
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != version:
+                # Computed from data that has since changed
+                del self._entries[key]
+                self.invalidated += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return {section: list(points) for section, points in entry[1].items()}
+
+    def get_latest(self, question):
+        """
+        Newest explanation stored for this (normalized) question,
+        whatever rows it was produced from, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(self._latest.get(question))
+            if entry is None:
+                return None
+        return {section: list(points) for section, points in entry[1].items()}
+
+    def put(self, key, version, explanation: dict, question=None):
+        with self._lock:
+            self._entries[key] = (version, {
+                section: list(points) for section, points in explanation.items()
+            })
+            self._entries.move_to_end(key)
+            if question is not None:
+                self._latest[question] = key
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                self._latest = {q: k for q, k in self._latest.items() if k != evicted}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidated": self.invalidated
+            }
@@ -0,0 +1,346 @@
+"""
+Session-scoped follow-up questions against the previous result.
+
+remember() records each answer's SQL, columns, size and first rows; that is
+all the follow-up prompt needs, so nothing is copied on the request path.
+The first follow-up that reads prev_result materializes it as a TEMP table
+on a connection pinned from the SQLite pool, and later refinements such as
+"now only for SP" or "break that down by month" read that small
+intermediate result instead of rescanning the base tables. A follow-up's
+own result is built from the pinned table when the next follow-up needs it.
+
+Limits keep this from starving the pool or memory:
+- at most `max_pinned` sessions hold a pooled connection (least recently
+  used ones give theirs back first)
+- results over MAX_MATERIALIZED_ROWS / MAX_MATERIALIZED_BYTES are never
+  copied; their SQL is inlined as a CTE instead (WITH prev_result AS (...))
+- sessions idle for IDLE_TIMEOUT_S are dropped
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+PREV_TABLE = "prev_result"
+NEXT_TABLE = "_prev_result_next"
+
+MAX_PINNED = 2
+MAX_MATERIALIZED_ROWS = 100_000
+MAX_MATERIALIZED_BYTES = 32 * 1024 * 1024
+MAX_SESSIONS = 1_000
+IDLE_TIMEOUT_S = 15 * 60
+PREVIEW_ROWS = 5
+# Rows inspected for column types and size
+SAMPLE_ROWS = 1_000
+
+_PREV_REF = re.compile(rf"\b{PREV_TABLE}\b", re.IGNORECASE)
+
+_SQLITE_TYPES = {int: "INTEGER", float: "REAL", str: "TEXT", bytes: "BLOB"}
+
+
+def references_previous(sql) -> bool:
+    return bool(_PREV_REF.search(sql))
+
+
+def inline_previous(sql, previous_sql):
+    """
+    Self-contained form of a follow-up query: prev_result becomes a CTE
+    over the SQL that produced it.
+    """
+    sql = sql.strip().rstrip(";")
+    previous_sql = previous_sql.strip().rstrip(";")
+
+    with_clause = re.match(r"WITH\s+(RECURSIVE\s+)?", sql, re.IGNORECASE)
+    if with_clause:
+        recursive = with_clause.group(1) or ""
+        return (
+            f"WITH {recursive}{PREV_TABLE} AS (\n{previous_sql}\n),\n"
+            f"{sql[with_clause.end():]}"
+        )
+    return f"WITH {PREV_TABLE} AS (\n{previous_sql}\n)\n{sql}"
+
+
+def _unique_names(cols):
+    seen = {}
+    names = []
+    for col in cols:
+        name = str(col)
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}_{seen[name]}")
+    return names
+
+
+def _column_types(rows, width):
+    types = []
+    for i in range(width):
+        value = next((row[i] for row in rows if row[i] is not None), None)
+        types.append(_SQLITE_TYPES.get(type(value), ""))
+    return types
+
+
+def _estimate_bytes(rows):
+    if not rows:
+        return 0
+    sample = rows[:SAMPLE_ROWS]
+    per_row = sum(len(repr(row)) for row in sample) / len(sample)
+    return int(per_row * len(rows))
+
+
+class _Session:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.question = None
+        self.sql = None         # self-contained SQL of the previous result
+        self.source_sql = None  # SQL that builds the next prev_result table
+        self.columns = []
+        self.types = []
+        self.preview = []
+        self.row_count = 0
+        self.bytes = 0
+        self.small = False      # within the materialization limits
+        self.materialized = False
+        self.conn = None        # pinned connection holding prev_result
+        self.last_used = 0.0
+
+
+class FollowupManager:
+    def __init__(
+        self,
+        pool_factory,
+        max_pinned=MAX_PINNED,
+        max_rows=MAX_MATERIALIZED_ROWS,
+        max_bytes=MAX_MATERIALIZED_BYTES,
+        idle_timeout=IDLE_TIMEOUT_S,
+        clock=time.monotonic
+    ):
+        self.pool_factory = pool_factory
+        self.max_pinned = max_pinned
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.idle_timeout = idle_timeout
+        self.clock = clock
+
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.evicted = 0
+        self.materializations = 0
+
+    # ---------------- Session bookkeeping ----------------
+
+    def _session(self, session_id, create=False):
+        with self._lock:
+            self._evict_idle()
+            session = self._sessions.get(session_id)
+            if session is None and create:
+                session = _Session()
+                self._sessions[session_id] = session
+                while len(self._sessions) > MAX_SESSIONS:
+                    _, oldest = self._sessions.popitem(last=False)
+                    self._unpin(oldest)
+                    self.evicted += 1
+            if session is not None:
+                session.last_used = self.clock()
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def _evict_idle(self):
+        deadline = self.clock() - self.idle_timeout
+        for session_id, session in list(self._sessions.items()):
+            if session.last_used < deadline and session.lock.acquire(blocking=False):
+                try:
+                    self._unpin(session)
+                finally:
+                    session.lock.release()
+                del self._sessions[session_id]
+                self.evicted += 1
+
+    def _unpin(self, session):
+        """
+        Drops prev_result and returns the connection to the pool.
+        The session keeps its SQL, so follow-ups fall back to the CTE.
+        """
+        session.materialized = False
+        session.source_sql = session.sql
+        if session.conn is None:
+            return
+        conn, session.conn = session.conn, None
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS temp.{PREV_TABLE}")
+            conn.execute(f"DROP TABLE IF EXISTS temp.{NEXT_TABLE}")
+            conn.execute("PRAGMA temp_store = DEFAULT")
+        finally:
+            self.pool_factory().release(conn)
+
+    def _pin(self, session):
+        """
+        A pooled connection for this session, taking one back from the
+        least recently used pinned session if needed. None if every
+        connection is busy.
+        """
+        if session.conn is not None:
+            return session.conn
+
+        with self._lock:
+            pinned = [s for s in self._sessions.values() if s.conn is not None]
+            for other in pinned[:max(0, len(pinned) - self.max_pinned + 1)]:
+                if other is not session and other.lock.acquire(blocking=False):
+                    try:
+                        self._unpin(other)
+                    finally:
+                        other.lock.release()
+            if sum(s.conn is not None for s in self._sessions.values()) >= self.max_pinned:
+                return None
+
+        try:
+            conn = self.pool_factory().acquire(timeout=0)
+        except TimeoutError:
+            return None
+        conn.execute("PRAGMA temp_store = MEMORY")
+        session.conn = conn
+        return conn
+
+    def _materialize(self, session):
+        """
+        Builds prev_result on the session's pinned connection, from the
+        current table when the result was computed against it, otherwise
+        by re-running the self-contained SQL. False if it stays a CTE.
+        """
+        if session.materialized:
+            return True
+        if not session.small:
+            return False
+
+        conn = self._pin(session)
+        if conn is None:
+            return False
+
+        declared = ", ".join(
+            f'"{name}" {col_type}'.rstrip()
+            for name, col_type in zip(session.columns, session.types)
+        )
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS temp.{NEXT_TABLE}")
+            conn.execute(f"CREATE TEMP TABLE {NEXT_TABLE} ({declared})")
+            conn.execute(f"INSERT INTO temp.{NEXT_TABLE} {session.source_sql}")
+            conn.execute(f"DROP TABLE IF EXISTS temp.{PREV_TABLE}")
+            conn.execute(f"ALTER TABLE temp.{NEXT_TABLE} RENAME TO {PREV_TABLE}")
+            conn.commit()
+        except Exception:
+            # Keep answering through the CTE
+            self._unpin(session)
+            return False
+
+        session.materialized = True
+        self.materializations += 1
+        return True
+
+    # ---------------- Public API ----------------
+
+    def remember(self, session_id, question, sql, cols, rows, relative_sql=None):
+        """
+        Makes (cols, rows) the session's previous result. Only metadata is
+        kept; the table is built on the first follow-up that needs it.
+        relative_sql: the query as run against the current prev_result
+        table (for follow-up results), so the next table is built from it.
+        """
+        session = self._session(session_id, create=True)
+        with session.lock:
+            names = _unique_names(cols)
+            sample = rows[:SAMPLE_ROWS]
+
+            rebuild_from_table = relative_sql is not None and session.materialized
+            session.question = question
+            session.sql = sql
+            session.source_sql = relative_sql if rebuild_from_table else sql
+            session.columns = names
+            session.types = _column_types(sample, len(names))
+            session.preview = [tuple(row) for row in rows[:PREVIEW_ROWS]]
+            session.row_count = len(rows)
+            session.bytes = _estimate_bytes(rows)
+            session.small = session.row_count <= self.max_rows and session.bytes <= self.max_bytes
+            # The temp table, if any, still holds the result before this one
+            session.materialized = False
+
+    def forget(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None:
+            with session.lock:
+                self._unpin(session)
+
+    def has_context(self, session_id) -> bool:
+        session = self._session(session_id)
+        return session is not None and session.sql is not None
+
+    def previous_sql(self, session_id):
+        session = self._session(session_id)
+        return session.sql if session else None
+
+    def describe(self, session_id) -> str:
+        """
+        prev_result's schema, size and first rows, for the follow-up prompt.
+        """
+        session = self._session(session_id)
+        if session is None or session.sql is None:
+            return ""
+
+        columns = ",\n".join(
+            f"    {name} {col_type}".rstrip()
+            for name, col_type in zip(session.columns, session.types)
+        )
+        lines = [
+            f"CREATE TABLE {PREV_TABLE} (\n{columns}\n)",
+            f"-- {session.row_count} rows, answering: {session.question}",
+        ]
+        if session.preview:
+            lines.append("-- First rows:")
+            lines += ["-- " + " | ".join(map(str, row)) for row in session.preview]
+        return "\n".join(lines)
+
+    def execute(self, session_id, sql, execute_fn):
+        """
+        Runs a follow-up query. Queries that read prev_result run on the
+        session's pinned connection (materializing it first), or with
+        prev_result inlined as a CTE (through execute_fn) when it is too
+        large or no connection is free.
+        Returns (self-contained sql, cols, rows, relative sql or None);
+        pass the last one back to remember().
+        """
+        if not references_previous(sql):
+            cols, rows = execute_fn(sql)
+            return sql, cols, rows, None
+
+        session = self._session(session_id)
+        if session is None or session.sql is None:
+            raise RuntimeError("SQL execution failed: no previous result to refine")
+
+        with session.lock:
+            full_sql = inline_previous(sql, session.sql)
+
+            if not self._materialize(session):
+                cols, rows = execute_fn(full_sql)
+                return full_sql, cols, rows, None
+
+            cursor = session.conn.cursor()
+            try:
+                cursor.execute(sql)
+                rows = cursor.fetchall()
+                cols = [d[0] for d in cursor.description] if cursor.description else []
+            except Exception as e:
+                raise RuntimeError(f"SQL execution failed: {e}")
+            finally:
+                cursor.close()
+
+        return full_sql, cols, rows, sql.strip().rstrip(";")
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {
+            "sessions": len(sessions),
+            "pinned": sum(s.conn is not None for s in sessions),
+            "materialized": sum(s.materialized for s in sessions),
+            "materializations": self.materializations,
+            "evicted": self.evicted
+        }
@@ -1,12 +1,28 @@
 import os
-from openai import OpenAI
+import threading
 from dotenv import load_dotenv  
 
 load_dotenv()
 
-client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
-)
+# openai pulls in a large import graph; the client is built on first use
+# and shared by every session in the process.
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+
+                # Retries are handled by the resilient wrapper below
+                _client = OpenAI(
+                    api_key=os.getenv("OPENAI_API_KEY"),
+                    max_retries=0
+                )
+    return _client
 
 # 1. load_schema
 # 2. load_prompt_template
@@ -20,40 +36,93 @@ client = OpenAI(
 # 10. explain_result
 
 
-import sqlite3
 from pathlib import Path
-import pandas as pd
 import re
 
+from src.admission import AdmissionController, AdmissionRejected
+from src.approximate import add_confidence_intervals, estimate_sql, is_estimate
+from src.backends import SQLiteBackend, DuckDBBackend, referenced_tables, route_query
+from src.explanation_cache import ExplanationCache, result_fingerprint
+from src.followup import FollowupManager
+from src.intent_router import match_intent
+from src.llm_client import LLMUnavailable, ResilientLLMClient
+from src.prompt_manager import PromptManager
+from src.result_summary import summarize_result
+
 DB_PATH = Path("data/target.db")
 CSV_DIR = Path("data/csv/") 
+PARQUET_DIR = Path("data/parquet/")
+SNAPSHOT_DIR = Path("data/snapshot/")
+PROMPTS_DIR = Path("prompts/")
+
+# sqlite | duckdb | auto (route each query by its SQLite plan)
+SQL_BACKEND = os.getenv("SQL_BACKEND", "auto").lower()
+
+_backends = {}
+
+prompt_manager = PromptManager(PROMPTS_DIR)
+
+# Shared by every session / thread in the process
+admission = AdmissionController()
+
+explanation_cache = ExplanationCache()
+
+# Per-session prev_result tables on connections borrowed from the SQLite pool
+followups = FollowupManager(lambda: get_backend("sqlite").pool)
+
+# Deadlines, retries, hedging and circuit breaking for every LLM call
+# Every request sent (retries, hedges) takes a token of global LLM capacity
+llm = ResilientLLMClient(
+    lambda: get_client(),
+    before_request=lambda hedge: admission.charge("llm", blocking=not hedge)
+)
+SQL_DEADLINE_S = 30.0
+EXPLAIN_DEADLINE_S = 20.0
+TITLE_DEADLINE_S = 5.0
+
+# Fast-path SQL -> whether it plans against the live schema
+_fast_path_checked = {}
+
+
+def get_backend(name="sqlite"):
+    if name not in _backends:
+        if name == "duckdb":
+            _backends[name] = DuckDBBackend(PARQUET_DIR, DB_PATH)
+        else:
+            _backends[name] = SQLiteBackend(DB_PATH, CSV_DIR, SNAPSHOT_DIR)
+    return _backends[name]
+
+
+def duckdb_enabled():
+    return SQL_BACKEND != "sqlite" and DuckDBBackend.available()
 
 
 
 def initialize_database():
-    
-    if DB_PATH.exists():
-        return  # DB already exists, do nothing
+    get_backend("sqlite").initialize()
 
-    print("Creating database from CSV files...")
+    if duckdb_enabled():
+        get_backend("duckdb").initialize()
 
-    conn = sqlite3.connect(DB_PATH)
 
-    for csv_file in CSV_DIR.glob("*.csv"):
-        table_name = csv_file.stem
-        df = pd.read_csv(csv_file)
 
-        df.to_sql(
-            table_name,
-            conn,
-            if_exists="replace",
-            index=False
-        )
+def get_data_version():
+    return get_backend("sqlite").data_version()
 
-        print(f"Loaded table: {table_name}")
 
-    conn.close()
-    print("Database creation complete.")
+
+def get_result_version(sql=None):
+    """
+    Version of the data a query read: its tables' versions, so refreshing
+    other tables leaves cached results for it valid. Falls back to the
+    database-wide data version.
+    """
+    if sql:
+        tables = referenced_tables(sql)
+        versions = get_backend("sqlite").table_versions(tables) if tables else None
+        if versions:
+            return versions
+    return get_data_version()
 
 
 
@@ -61,26 +130,18 @@ def load_schema():
     """
     Reads SQLite schema and returns it as text for the LLM
     """
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-
-    cursor.execute("""
-        SELECT name, sql
-        FROM sqlite_master
-        WHERE type='table'
-    """)
+    return get_backend("sqlite").load_schema()
 
-    schema_text = ""
-    for table_name, table_sql in cursor.fetchall():
-        schema_text += f"\n-- {table_name}\n{table_sql}\n"
 
-    conn.close()
-    return schema_text
+def load_prompt_template():
+    return prompt_manager.get("sql_generator_prompt").text
 
 
-def load_prompt_template():
-    with open("prompts/sql_generator_prompt.txt", "r", encoding="utf-8") as f:
-        return f.read()
+def get_prompt_stats():
+    """
+    Prefix-cache reuse and tokens per request for each prompt.
+    """
+    return prompt_manager.stats()
 
 
 def validate_question(question: str):
@@ -104,19 +165,22 @@ def validate_question(question: str):
 
 
 def generate_sql(prompt, schema, question):
-    filled_prompt = prompt.format(
-        schema=schema,
-        question=question
+    # Rules + schema form a stable prefix; only the question varies
+    messages = prompt_manager.build_messages(
+        "sql_generator_prompt",
+        system="You are an expert SQL generator.",
+        template=prompt,
+        static={"schema": schema},
+        variable={"question": question}
     )
 
-    response = client.chat.completions.create(
+    response = llm.create(
+        deadline=SQL_DEADLINE_S,
         model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an expert SQL generator."},
-            {"role": "user", "content": filled_prompt}
-        ],
+        messages=messages,
         temperature=0
     )
+    prompt_manager.record_usage("sql_generator_prompt", response.usage)
 
     sql = response.choices[0].message.content.strip()
     return sql
@@ -151,15 +215,20 @@ Question:
 Title:
 """
 
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You generate concise analytics chat titles."},
-            {"role": "user", "content": prompt}
-        ],
-        temperature=0.0,
-        max_tokens=12
-    )
+    try:
+        response = llm.create(
+            deadline=TITLE_DEADLINE_S,
+            model="gpt-4o-mini",
+            messages=[
+                {"role": "system", "content": "You generate concise analytics chat titles."},
+                {"role": "user", "content": prompt}
+            ],
+            temperature=0.0,
+            max_tokens=12
+        )
+    except (LLMUnavailable, AdmissionRejected):
+        # Titles are cosmetic: fall back to the question itself
+        return " ".join(question.split()[:6]).rstrip("?").title()
 
     return response.choices[0].message.content.strip()
 
@@ -187,8 +256,9 @@ def validate_sql(sql: str):
     # 1️. Block destructive operations
     for pattern in forbidden_patterns:
         if re.search(pattern, sql_upper):
+            keyword = pattern.replace("\\b", "")
             raise ValueError(
-                f"❌ Forbidden SQL operation detected: {pattern.replace('\\b', '')}"
+                f"❌ Forbidden SQL operation detected: {keyword}"
             )
 
     # 2️. Allow only SELECT / WITH queries
@@ -215,41 +285,75 @@ def auto_fix_sql(sql: str) -> str:
 
 
 def retry_with_error(prompt, schema, question, error):
-    repair_prompt = f"""
-You generated SQL that failed in SQLite.
-
-ERROR:
-{error}
-
-Fix the SQL so it runs successfully in SQLite.
-Follow all safety rules.
-Return ONLY SQL.
-
-Schema:
-{schema}
-
-Question:
-{question}
-"""
+    messages = prompt_manager.build_messages(
+        "sql_repair_prompt",
+        system="You are an expert SQLite SQL fixer.",
+        static={"schema": schema},
+        variable={"error": error, "question": question}
+    )
 
-    response = client.chat.completions.create(
+    response = llm.create(
+        deadline=SQL_DEADLINE_S,
         model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are an expert SQLite SQL fixer."},
-            {"role": "user", "content": repair_prompt}
-        ],
+        messages=messages,
         temperature=0
     )
+    prompt_manager.record_usage("sql_repair_prompt", response.usage)
 
     return response.choices[0].message.content.strip()
 
 
 
-def run_safe_sql(prompt, schema, question, max_retries=1):
+def fast_path_sql(question):
+    """
+    Template SQL for a recognized question, or None.
+    """
+    match = match_intent(question)
+    if match is None:
+        return None
+
+    # Templates are validated once against the live schema; a missing
+    # table or column sends the question to the LLM instead
+    if match.sql not in _fast_path_checked:
+        _fast_path_checked[match.sql] = bool(get_backend("sqlite").query_plan(match.sql))
+    if not _fast_path_checked[match.sql]:
+        return None
+    return match.sql
+
+
+def try_fast_path(question, approximate=False):
+    """
+    Answers template-shaped questions without the LLM.
+    Returns (sql, cols, rows) or None to fall through to generate_sql.
+    """
+    sql = fast_path_sql(question)
+    if sql is None:
+        return None
+
+    try:
+        cols, rows = _execute(sql, approximate)
+    except AdmissionRejected:
+        # Out of capacity: the LLM path would be rejected too, after paying
+        raise
+    except RuntimeError:
+        return None
+    return sql, cols, rows
+
+
+
+def run_safe_sql(prompt, schema, question, max_retries=1, approximate=False):
+    """
+    approximate=True answers eligible aggregates from the sample tables
+    (see execute_sql); the returned SQL is always the exact query.
+    """
 
     # 1. Block destructive intent early
     validate_question(question)
 
+    fast = try_fast_path(question, approximate=approximate)
+    if fast is not None:
+        return fast
+
     sql = generate_sql(prompt, schema, question)
 
     for attempt in range(max_retries + 1):
@@ -261,10 +365,13 @@ def run_safe_sql(prompt, schema, question, max_retries=1):
             sql = auto_fix_sql(sql)
 
             # 4. Execute
-            cols, rows = execute_sql(sql)
+            cols, rows = _execute(sql, approximate)
 
             return sql, cols, rows
 
+        except AdmissionRejected:
+            # Out of capacity, not a SQL error: don't spend a repair call
+            raise
         except Exception as e:
             if attempt >= max_retries:
                 raise RuntimeError(f"Final SQL failed: {e}")
@@ -279,58 +386,274 @@ def run_safe_sql(prompt, schema, question, max_retries=1):
 
 
 
-def execute_sql(sql):
+def prepare_sql(prompt, schema, question, max_retries=1):
+    """
+    Like run_safe_sql but stops before execution: returns validated SQL
+    that SQLite can plan, for callers that stream the rows themselves.
+    """
+    validate_question(question)
+
+    sql = fast_path_sql(question)
+    if sql is not None:
+        return sql
+
+    sql = generate_sql(prompt, schema, question)
+
+    for attempt in range(max_retries + 1):
+        try:
+            validate_sql(sql)
+            sql = auto_fix_sql(sql)
+            get_backend("sqlite").query_plan(sql, raise_errors=True)
+            return sql
+
+        except Exception as e:
+            if attempt >= max_retries:
+                raise RuntimeError(f"Final SQL failed: {e}")
+
+            sql = retry_with_error(
+                prompt=prompt,
+                schema=schema,
+                question=question,
+                error=str(e)
+            )
+
+
+def stream_sql(sql, batch_size=1000, timeout=None):
+    """
+    Yields column names, then row batches, from a pooled connection
+    (TimeoutError if none is free within timeout seconds). SQLite capacity
+    is charged on the first next(), so async callers can take the wait on
+    a worker thread.
+    """
     if not sql.strip().lower().startswith(("select", "with")):
         raise ValueError("❌ Only SELECT queries can be executed")
 
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
+    return _charged_stream(sql, batch_size, timeout)
+
+
+def _charged_stream(sql, batch_size, timeout):
+    admission.charge("sqlite")
+    yield from get_backend("sqlite").iterate(sql, batch_size, timeout)
+
+
+
+def normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def generate_followup_sql(schema, question, session_id):
+    messages = prompt_manager.build_messages(
+        "sql_followup_prompt",
+        system="You are an expert SQL generator.",
+        static={"schema": schema},
+        variable={
+            "previous_table": followups.describe(session_id),
+            "previous_sql": followups.previous_sql(session_id),
+            "question": question
+        }
+    )
+
+    response = llm.create(
+        deadline=SQL_DEADLINE_S,
+        model="gpt-4o-mini",
+        messages=messages,
+        temperature=0
+    )
+    prompt_manager.record_usage("sql_followup_prompt", response.usage)
+
+    return response.choices[0].message.content.strip()
+
+
+def run_followup(schema, question, session_id, max_retries=1):
+    """
+    Answers a refinement of the session's previous result. The model sees
+    prev_result's schema and mostly queries it instead of the base tables.
+    Returns (sql, cols, rows, relative_sql): sql is self-contained
+    (prev_result inlined as a CTE); relative_sql is for remember_result.
+    """
+    validate_question(question)
+
+    if not followups.has_context(session_id):
+        raise ValueError("❌ No previous result to refine. Ask a full question first.")
+
+    sql = generate_followup_sql(schema, question, session_id)
+
+    for attempt in range(max_retries + 1):
+        try:
+            validate_sql(sql)
+            sql = auto_fix_sql(sql)
+            admission.charge("sqlite")
+            return followups.execute(session_id, sql, _run_sql)
+
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            if attempt >= max_retries:
+                raise RuntimeError(f"Final SQL failed: {e}")
+
+            sql = retry_with_error(
+                prompt=None,
+                schema=f"{schema}\n\n{followups.describe(session_id)}",
+                question=question,
+                error=str(e)
+            )
+
+
+def run_admitted(prompt, schema, question, user_id, priority=0, max_retries=1,
+                 approximate=False, session_id=None, followup=False):
+    """
+    run_safe_sql behind process-wide admission control.
+    Identical in-flight questions share a single run.
+    session_id: keep the answer for follow-ups in that session;
+    followup=True refines its previous result (see run_followup).
+    """
+    validate_question(question)
 
+    key = normalize_question(question)
+    if followup:
+        if session_id is None:
+            raise ValueError("❌ Follow-up questions need a session id.")
+        # Same words, different previous result per session
+        key = f"followup:{session_id}:{key}"
+        work = lambda: run_followup(schema, question, session_id, max_retries=max_retries)
+    else:
+        if approximate:
+            key = "approx:" + key
+        work = lambda: (*run_safe_sql(
+            prompt, schema, question,
+            max_retries=max_retries, approximate=approximate
+        ), None)
+
+    sql, cols, rows, relative_sql = admission.run(user_id, key, work, priority=priority)
+    if session_id is not None:
+        remember_result(session_id, question, sql, cols, rows, relative_sql)
+    return sql, cols, rows
+
+
+def remember_result(session_id, question, sql, cols, rows, relative_sql=None):
+    """
+    Keeps an exact result as the session's prev_result for follow-ups.
+    Estimates are skipped: their rows do not match their SQL.
+    """
+    if is_estimate(cols):
+        return
     try:
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-        col_names = [d[0] for d in cursor.description] if cursor.description else []
+        followups.remember(session_id, question, sql, cols, rows, relative_sql)
     except Exception as e:
-        conn.close()
-        raise RuntimeError(f"SQL execution failed: {e}")
+        # Follow-ups are optional; never fail the answer over them
+        print(f"Could not keep result for follow-ups: {e}")
 
-    conn.close()
-    return col_names, rows
 
 
+def execute_sql(sql, approximate=False):
+    """
+    approximate=True runs eligible COUNT / SUM / AVG queries on the
+    stratified sample tables and appends <col>_ci_low / <col>_ci_high
+    columns; other queries run exactly.
+    """
+    if not sql.strip().lower().startswith(("select", "with")):
+        raise ValueError("❌ Only SELECT queries can be executed")
 
-def explain_result(question, cols, rows):
-    if not rows:
-        return ["No data returned, so no insights can be generated."]
+    admission.charge("sqlite")
+    return _run_sql(sql, approximate)
 
-    preview_rows = rows[:10]
 
-    result_text = "\n".join([str(row) for row in preview_rows])
-    columns_text = ", ".join(cols)
+def _run_sql(sql, approximate=False):
+    if approximate:
+        sqlite = get_backend("sqlite")
+        estimate = estimate_sql(sql, sqlite.sample_tables())
+        if estimate is not None:
+            cols, rows = sqlite.execute(estimate.sql)
+            return add_confidence_intervals(estimate, cols, rows)
+
+    sqlite = get_backend("sqlite")
+    backend = route_query(
+        sql,
+        sqlite,
+        get_backend("duckdb") if duckdb_enabled() else None,
+        mode=SQL_BACKEND
+    )
+    if backend is sqlite or SQL_BACKEND != "auto":
+        return backend.execute(sql)
+
+    # The SQL is written for SQLite: a DuckDB failure is a dialect gap,
+    # not a reason to spend an LLM repair call
+    try:
+        return backend.execute(sql)
+    except RuntimeError as e:
+        print(f"DuckDB could not run the query, using SQLite: {e}")
+        return sqlite.execute(sql)
+
+
+
+def _execute(sql, approximate):
+    # Only pass the flag when set so execute_sql stays a one-argument hook
+    if approximate:
+        return execute_sql(sql, approximate=True)
+    return execute_sql(sql)
+
 
-    with open("prompts/sql_explainer_prompt.txt", "r", encoding="utf-8") as f:
-        prompt = f.read()
 
+def explain_result(question, cols, rows, sql=None):
+    """
+    sql (optional) is the query that produced the rows; with it, cached
+    explanations are invalidated only when one of its tables changes.
+    """
+    if not rows:
+        return ["No data returned, so no insights can be generated."]
+
+    # Same question + byte-identical result -> reuse the explanation
+    cache_key = result_fingerprint(normalize_question(question), cols, rows)
+    data_version = get_result_version(sql)
+    cached = explanation_cache.get(cache_key, data_version)
+    if cached is not None:
+        return cached
+
+    # Stats + representative rows instead of whatever sorted first
+    result_text = summarize_result(cols, rows)
     columns_text = ", ".join(cols)
 
-    filled_prompt = prompt.format(
-        question=question,
-        columns=columns_text,
-        result=result_text
-    )
-    
-    response = client.chat.completions.create(
-        model="gpt-4o-mini",
-        messages=[
-            {"role": "system", "content": "You are a senior business data analyst who explains insights clearly."},
-            {"role": "user", "content": filled_prompt}
-        ],
-        temperature=0.3
+    messages = prompt_manager.build_messages(
+        "sql_explainer_prompt",
+        system="You are a senior business data analyst who explains insights clearly.",
+        variable={
+            "question": question,
+            "columns": columns_text,
+            "result": result_text
+        }
     )
 
+    try:
+        response = llm.create(
+            deadline=EXPLAIN_DEADLINE_S,
+            model="gpt-4o-mini",
+            messages=messages,
+            temperature=0.3
+        )
+    except (LLMUnavailable, AdmissionRejected):
+        # Degrade to the last explanation for this question, if any
+        stale = explanation_cache.get_latest(normalize_question(question))
+        if stale is not None:
+            stale["note"] = (
+                "Explanation of an earlier result for this question; "
+                "it may not match the rows shown."
+            )
+            return stale
+        return {
+            "insights": ["Explanation is temporarily unavailable. Please try again shortly."],
+            "recommendations": []
+        }
+    prompt_manager.record_usage("sql_explainer_prompt", response.usage)
+
     explanation = response.choices[0].message.content.strip().split("\n")
     raw_points = explanation
-    return normalize_explanation(raw_points)
+    normalized = normalize_explanation(raw_points)
+
+    explanation_cache.put(
+        cache_key, data_version, normalized,
+        question=normalize_question(question)
+    )
+    return normalized
 
 
 
@@ -402,7 +725,7 @@ def run():
         print(" | ".join(map(str, row)))
 
 
-    explanation = explain_result(question, cols, rows)
+    explanation = explain_result(question, cols, rows, sql=sql)
 
     print("\n--- GENAI EXPLANATION ---")
     for point in explanation:
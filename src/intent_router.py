@@ -0,0 +1,206 @@
+"""
+Deterministic fast path for common question shapes.
+
+A small set of question templates over the eight Olist tables map directly
+to parameterized SQL, so they skip the LLM entirely (milliseconds, zero
+tokens). Matching is a full match on the normalized question; anything
+else returns None and falls through to generate_sql.
+"""
+
+import re
+from typing import NamedTuple, Optional
+
+# ---------------- Catalog ----------------
+
+# entity word -> (table, count expression, timestamp column)
+DATED_ENTITIES = {
+    "orders": ("orders", "COUNT(DISTINCT order_id)", "order_purchase_timestamp"),
+    "reviews": ("order_reviews", "COUNT(DISTINCT review_id)", "review_creation_date"),
+    "purchases": ("orders", "COUNT(DISTINCT order_id)", "order_purchase_timestamp"),
+}
+
+PERIODS = {
+    "year": ("strftime('%Y', {col})", "year"),
+    "month": ("strftime('%Y-%m', {col})", "month"),
+    "hour": ("strftime('%H', {col})", "hour"),
+}
+
+# (entity, dimension) -> (FROM clause, count expression, group column, alias)
+DIMENSION_COUNTS = {
+    ("customers", "state"): ("customers", "COUNT(DISTINCT customer_id)", "customer_state", "customer_state"),
+    ("customers", "city"): ("customers", "COUNT(DISTINCT customer_id)", "customer_city", "customer_city"),
+    ("sellers", "state"): ("sellers", "COUNT(DISTINCT seller_id)", "seller_state", "seller_state"),
+    ("sellers", "city"): ("sellers", "COUNT(DISTINCT seller_id)", "seller_city", "seller_city"),
+    ("orders", "status"): ("orders", "COUNT(DISTINCT order_id)", "order_status", "order_status"),
+    ("orders", "state"): (
+        "orders o JOIN customers c ON o.customer_id = c.customer_id",
+        "COUNT(DISTINCT o.order_id)", "c.customer_state", "customer_state"
+    ),
+    ("orders", "payment type"): ("payments", "COUNT(DISTINCT order_id)", "payment_type", "payment_type"),
+    ("products", "category"): ("products", "COUNT(DISTINCT product_id)", "product_category_name", "category"),
+}
+
+# ranked dimension -> (FROM clause, group column, alias)
+REVENUE_DIMENSIONS = {
+    "categories": (
+        "order_items oi JOIN products p ON oi.product_id = p.product_id",
+        "p.product_category_name", "category"
+    ),
+    "product categories": (
+        "order_items oi JOIN products p ON oi.product_id = p.product_id",
+        "p.product_category_name", "category"
+    ),
+    "sellers": ("order_items oi", "oi.seller_id", "seller_id"),
+    "seller states": (
+        "order_items oi JOIN sellers s ON oi.seller_id = s.seller_id",
+        "s.seller_state", "seller_state"
+    ),
+    "states": (
+        "order_items oi JOIN orders o ON oi.order_id = o.order_id "
+        "JOIN customers c ON o.customer_id = c.customer_id",
+        "c.customer_state", "customer_state"
+    ),
+}
+
+DELIVERY_DIMENSIONS = {
+    "state": ("c.customer_state", "customer_state"),
+    "customer state": ("c.customer_state", "customer_state"),
+    "city": ("c.customer_city", "customer_city"),
+    "customer city": ("c.customer_city", "customer_city"),
+}
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "fifteen": 15, "twenty": 20,
+}
+
+MAX_TOP_N = 100
+
+
+class IntentMatch(NamedTuple):
+    intent: str
+    sql: str
+
+
+# ---------------- Patterns ----------------
+
+_LEAD = r"(?:(?:show|list|give|tell)(?: me)? |(?:what|which) (?:is|are) |find )?(?:the )?"
+_COUNT = r"(?:how many|number of|count of|count|total)"
+_EACH = r"(?:per|by|in each|for each|each|across)"
+
+
+def _alternatives(words):
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+_COUNT_BY_PERIOD = re.compile(
+    rf"{_LEAD}{_COUNT} (?:of )?(?P<entity>{_alternatives(DATED_ENTITIES)})"
+    rf"(?: were)?(?: placed| made| written| received)? {_EACH} (?P<period>{_alternatives(PERIODS)})"
+)
+
+_COUNT_BY_DIMENSION = re.compile(
+    rf"{_LEAD}{_COUNT} (?:of )?(?P<entity>customers|sellers|orders|products)"
+    rf"(?: are there)? {_EACH} (?P<dim>{_alternatives({d for _, d in DIMENSION_COUNTS})})"
+)
+
+_TOP_BY_REVENUE = re.compile(
+    rf"{_LEAD}top (?P<n>\d+) (?P<dim>{_alternatives(REVENUE_DIMENSIONS)})"
+    r" by (?:total )?(?:revenue|sales)"
+)
+
+_AVG_DELIVERY = re.compile(
+    rf"{_LEAD}(?:average|avg|mean) delivery time(?: in days)? {_EACH}"
+    rf" (?P<dim>{_alternatives(DELIVERY_DIMENSIONS)})"
+)
+
+
+def normalize(question: str) -> str:
+    q = question.lower().strip()
+    q = re.sub(r"[?!.,;:]+", " ", q)
+    return " ".join(str(NUMBER_WORDS.get(w, w)) for w in q.split())
+
+
+# ---------------- Templates ----------------
+
+def _count_by_period(m):
+    table, count_expr, col = DATED_ENTITIES[m["entity"]]
+    expr, name = PERIODS[m["period"]]
+    alias = f"{'order' if table == 'orders' else 'review'}_{name}"
+    return f"""SELECT
+    {expr.format(col=col)} AS {alias},
+    {count_expr} AS total_{m["entity"]}
+FROM {table}
+WHERE {col} IS NOT NULL
+GROUP BY {alias}
+ORDER BY {alias}"""
+
+
+def _count_by_dimension(m):
+    key = (m["entity"], m["dim"])
+    if key not in DIMENSION_COUNTS:
+        return None
+    from_clause, count_expr, group_col, alias = DIMENSION_COUNTS[key]
+    return f"""SELECT
+    {group_col} AS {alias},
+    {count_expr} AS total_{m["entity"]}
+FROM {from_clause}
+GROUP BY {alias}
+ORDER BY total_{m["entity"]} DESC"""
+
+
+def _top_by_revenue(m):
+    n = int(m["n"])
+    if not 0 < n <= MAX_TOP_N:
+        return None
+    from_clause, group_col, alias = REVENUE_DIMENSIONS[m["dim"]]
+    return f"""SELECT
+    {group_col} AS {alias},
+    ROUND(SUM(oi.price), 2) AS total_revenue
+FROM {from_clause}
+GROUP BY {alias}
+ORDER BY total_revenue DESC
+LIMIT {n}"""
+
+
+def _avg_delivery(m):
+    group_col, alias = DELIVERY_DIMENSIONS[m["dim"]]
+    return f"""SELECT
+    {group_col} AS {alias},
+    ROUND(
+        AVG(
+            JULIANDAY(o.order_delivered_customer_date) -
+            JULIANDAY(o.order_purchase_timestamp)
+        ),
+        2
+    ) AS avg_delivery_days
+FROM orders o
+JOIN customers c ON o.customer_id = c.customer_id
+WHERE o.order_delivered_customer_date IS NOT NULL
+GROUP BY {alias}
+ORDER BY avg_delivery_days DESC"""
+
+
+INTENTS = [
+    ("count_by_period", _COUNT_BY_PERIOD, _count_by_period),
+    ("count_by_dimension", _COUNT_BY_DIMENSION, _count_by_dimension),
+    ("top_by_revenue", _TOP_BY_REVENUE, _top_by_revenue),
+    ("avg_delivery_time", _AVG_DELIVERY, _avg_delivery),
+]
+
+
+def match_intent(question: str) -> Optional[IntentMatch]:
+    """
+    Returns the templated SQL for a recognized question, else None.
+    """
+    q = normalize(question)
+
+    for intent, pattern, template in INTENTS:
+        m = pattern.fullmatch(q)
+        if not m:
+            continue
+        sql = template(m)
+        if sql:
+            return IntentMatch(intent, sql)
+
+    return None
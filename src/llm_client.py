@@ -0,0 +1,237 @@
+"""
+Resilient wrapper around chat.completions.create.
+
+- Per-call deadline shared by all attempts (passed to the SDK as timeout).
+- Retries on timeouts, connection errors, 408/409/429 and 5xx with
+  jittered exponential backoff. Other 4xx errors, and any other exception
+  (a bug on our side), are raised immediately.
+- Hedging: if an attempt is slower than the recent p95 latency, a
+  duplicate request is sent and whichever answers first wins.
+- Circuit breaker: after repeated failed calls, calls fail fast for a
+  cool-down period so callers can degrade (skip the title, serve a cached
+  explanation) instead of stalling the Streamlit run.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_DEADLINE_S = 30.0
+MAX_ATTEMPTS = 3
+BACKOFF_BASE_S = 0.5
+BACKOFF_MAX_S = 4.0
+
+# Hedge after the observed p95; until enough samples exist use the default
+HEDGE_DEFAULT_DELAY_S = 3.0
+HEDGE_MIN_DELAY_S = 0.05
+HEDGE_MIN_SAMPLES = 20
+
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_RESET_AFTER_S = 30.0
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+
+class LLMUnavailable(RuntimeError):
+    pass
+
+
+class CircuitOpenError(LLMUnavailable):
+    pass
+
+
+def is_retryable(error) -> bool:
+    # openai is already imported by the time a request has failed
+    import openai
+
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold=BREAKER_FAILURE_THRESHOLD,
+        reset_after=BREAKER_RESET_AFTER_S,
+        clock=time.monotonic
+    ):
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if self.clock() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        """
+        Closed: always. Open: never. Half-open: one trial call at a time.
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def release_trial(self):
+        """
+        Gives back a half-open trial slot when no request was sent.
+        """
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = self.clock()
+
+
+class ResilientLLMClient:
+    def __init__(
+        self,
+        client_factory,
+        max_attempts=MAX_ATTEMPTS,
+        backoff_base=BACKOFF_BASE_S,
+        backoff_max=BACKOFF_MAX_S,
+        hedge_default_delay=HEDGE_DEFAULT_DELAY_S,
+        breaker=None,
+        max_workers=16,
+        before_request=None
+    ):
+        self.client_factory = client_factory
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge_default_delay = hedge_default_delay
+        self.breaker = breaker or CircuitBreaker()
+        # before_request(hedge) runs before every request sent, retries and
+        # hedges included (e.g. to charge a rate limit). It may block or
+        # raise; for a hedge it must not block and returns False to skip it
+        self.before_request = before_request
+
+        self._latencies = deque(maxlen=200)
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm")
+        self.hedges = 0
+
+    def hedge_delay(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+        if len(latencies) < HEDGE_MIN_SAMPLES:
+            return self.hedge_default_delay
+        return max(HEDGE_MIN_DELAY_S, latencies[int(0.95 * (len(latencies) - 1))])
+
+    def _call(self, kwargs, timeout):
+        start = time.monotonic()
+        response = self.client_factory().chat.completions.create(timeout=timeout, **kwargs)
+        with self._lock:
+            self._latencies.append(time.monotonic() - start)
+        return response
+
+    def _hedged_call(self, kwargs, remaining):
+        deadline = time.monotonic() + remaining
+        primary = self._executor.submit(self._call, kwargs, remaining)
+        done, _ = wait([primary], timeout=min(self.hedge_delay(), remaining))
+        if done:
+            return primary.result()
+
+        if self.before_request is not None and not self.before_request(hedge=True):
+            # No capacity for a duplicate: keep waiting on the primary
+            return primary.result(timeout=max(0.0, deadline - time.monotonic()))
+
+        self.hedges += 1
+        hedge = self._executor.submit(self._call, kwargs, remaining)
+        pending = {primary, hedge}
+        error = None
+
+        # First success wins; the slower request is left to finish on its own
+        while pending:
+            done, pending = wait(
+                pending,
+                timeout=max(0.0, deadline - time.monotonic()),
+                return_when=FIRST_COMPLETED
+            )
+            if not done:
+                raise TimeoutError("LLM request exceeded its deadline")
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def create(self, deadline=DEFAULT_DEADLINE_S, **kwargs):
+        """
+        Drop-in for client.chat.completions.create with a total deadline.
+        Raises CircuitOpenError while the breaker is open and
+        LLMUnavailable once retries are exhausted.
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM temporarily unavailable (circuit open)")
+
+        deadline_at = time.monotonic() + deadline
+        last_error = None
+
+        for attempt in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+
+            if self.before_request is not None:
+                try:
+                    self.before_request(hedge=False)
+                except BaseException:
+                    # Nothing was sent: the breaker learned nothing
+                    self.breaker.release_trial()
+                    raise
+
+            try:
+                response = self._hedged_call(kwargs, remaining)
+            except Exception as e:
+                if not is_retryable(e):
+                    # Our request is wrong, not the upstream: don't trip the breaker
+                    self.breaker.record_success()
+                    raise
+                last_error = e
+            else:
+                self.breaker.record_success()
+                return response
+
+            backoff = min(self.backoff_max, self.backoff_base * 2 ** attempt)
+            sleep_for = random.uniform(0, backoff)
+            if time.monotonic() + sleep_for >= deadline_at:
+                break
+            time.sleep(sleep_for)
+
+        self.breaker.record_failure()
+        raise LLMUnavailable(f"LLM request failed: {last_error or 'deadline exceeded'}")
+
+    def stats(self):
+        return {
+            "circuit": self.breaker.state,
+            "hedged_requests": self.hedges,
+            "hedge_delay_s": round(self.hedge_delay(), 3)
+        }
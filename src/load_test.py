@@ -0,0 +1,100 @@
+"""
+Load test for the HTTP service (service.py).
+
+Fires requests from a pool of concurrent clients and reports requests/sec,
+latency percentiles and status codes.
+
+By default every request uses one user_id, like a single dashboard or batch
+job, so the per-client limits (API_USER_BURST / API_USER_RATE_PER_S in
+service.py) are part of what is measured. Use a corpus of distinct
+questions: repeats of one question are coalesced and only measure the
+shared run.
+
+Usage (service running on :8000):
+    python -m src.load_test --endpoint /query --concurrency 32 --requests 500
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+CORPUS_PATH = Path("data/questions.txt")
+
+
+def post(url, body, timeout):
+    data = json.dumps(body).encode("utf-8")
+    req = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        status = e.code
+    except (urllib.error.URLError, TimeoutError):
+        status = "error"
+    return status, time.perf_counter() - start
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--endpoint", default="/query")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--users", type=int, default=1, help="distinct user_ids to spread load over")
+    parser.add_argument("--corpus", type=Path, default=CORPUS_PATH)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    args = parser.parse_args()
+
+    questions = [
+        line.strip() for line in args.corpus.read_text(encoding="utf-8").splitlines()
+        if line.strip()
+    ]
+    url = args.url.rstrip("/") + args.endpoint
+
+    statuses = Counter()
+    latencies = []
+    lock = threading.Lock()
+
+    def one(i):
+        body = {
+            "question": random.choice(questions),
+            "user_id": "load-test" if args.users == 1 else f"load-{i % args.users}"
+        }
+        status, elapsed = post(url, body, args.timeout)
+        with lock:
+            statuses[status] += 1
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(one, range(args.requests)))
+    wall = time.perf_counter() - start
+
+    print(f"{args.requests} requests to {url} with {args.concurrency} clients in {wall:.2f}s")
+    print(f"Throughput:  {args.requests / wall:.1f} req/s")
+    print(
+        "Latency ms:  "
+        f"p50 {percentile(latencies, 0.50) * 1000:.1f}  "
+        f"p95 {percentile(latencies, 0.95) * 1000:.1f}  "
+        f"p99 {percentile(latencies, 0.99) * 1000:.1f}  "
+        f"max {max(latencies) * 1000:.1f}"
+    )
+    print("Status:      " + ", ".join(f"{k}: {v}" for k, v in sorted(statuses.items(), key=str)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Prompt templates loaded once, reloaded on change, rendered cache-friendly.
+
+Providers cache prompts by exact prefix. Every template is split at its
+first per-request placeholder (question, error, result, ...): the rules
+and schema before it go into the system message, which is byte-identical
+across calls, and only the variable tail goes into the user message.
+"""
+
+import hashlib
+import string
+import threading
+from pathlib import Path
+
+
+class PromptTemplate:
+    def __init__(self, text: str):
+        self.text = text
+        self.segments = list(string.Formatter().parse(text))
+
+    def render_split(self, static: dict, variable: dict):
+        """
+        Renders the template as (prefix, suffix) where the prefix holds
+        everything before the first variable field.
+        prefix + suffix == text.format(**static, **variable)
+        """
+        values = {**static, **variable}
+        prefix, suffix = [], []
+        target = prefix
+
+        for literal, field, spec, _ in self.segments:
+            target.append(literal)
+            if field is None:
+                continue
+            if field in variable:
+                target = suffix
+            target.append(format(values[field], spec or ""))
+
+        return "".join(prefix), "".join(suffix)
+
+
+class PromptManager:
+    def __init__(self, prompts_dir: Path):
+        self.prompts_dir = Path(prompts_dir)
+        self._templates = {}   # name -> (mtime_ns, PromptTemplate)
+        self._stats = {}       # name -> counters
+        self._seen_prefixes = set()
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> PromptTemplate:
+        """
+        Returns the compiled template, re-reading the file only
+        when its modification time changed.
+        """
+        path = self.prompts_dir / f"{name}.txt"
+        mtime_ns = path.stat().st_mtime_ns
+
+        with self._lock:
+            cached = self._templates.get(name)
+            if cached and cached[0] == mtime_ns:
+                return cached[1]
+
+        template = PromptTemplate(path.read_text(encoding="utf-8"))
+        with self._lock:
+            self._templates[name] = (mtime_ns, template)
+        return template
+
+    def build_messages(self, name, system, template=None, static=None, variable=None):
+        """
+        Chat messages with a stable system prefix and the variable part last.
+        `template` overrides the file contents (raw template text).
+        """
+        compiled = self.get(name)
+        if template is not None and template != compiled.text:
+            compiled = PromptTemplate(template)
+        prefix, suffix = compiled.render_split(static or {}, variable or {})
+
+        system_content = f"{system}\n\n{prefix}"
+        self._note_prefix(name, system_content)
+
+        return [
+            {"role": "system", "content": system_content},
+            {"role": "user", "content": suffix}
+        ]
+
+    def _note_prefix(self, name, content):
+        digest = hashlib.sha256(content.encode("utf-8")).digest()
+        with self._lock:
+            stats = self._stat(name)
+            stats["requests"] += 1
+            if digest in self._seen_prefixes:
+                stats["prefix_reuses"] += 1
+            else:
+                self._seen_prefixes.add(digest)
+
+    def record_usage(self, name, usage):
+        """
+        Adds provider-reported token usage (response.usage) for a prompt.
+        """
+        if usage is None:
+            return
+
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", 0) or 0
+
+        with self._lock:
+            stats = self._stat(name)
+            stats["prompt_tokens"] += getattr(usage, "prompt_tokens", 0) or 0
+            stats["cached_tokens"] += cached
+            stats["completion_tokens"] += getattr(usage, "completion_tokens", 0) or 0
+
+    def _stat(self, name):
+        return self._stats.setdefault(name, {
+            "requests": 0,
+            "prefix_reuses": 0,
+            "prompt_tokens": 0,
+            "cached_tokens": 0,
+            "completion_tokens": 0
+        })
+
+    def stats(self) -> dict:
+        """
+        Per-prompt prefix reuse and token usage per request.
+        """
+        report = {}
+        with self._lock:
+            for name, s in self._stats.items():
+                requests = s["requests"] or 1
+                report[name] = {
+                    "requests": s["requests"],
+                    "prefix_reuse_rate": s["prefix_reuses"] / requests,
+                    "prompt_tokens_per_request": s["prompt_tokens"] / requests,
+                    "cached_tokens_per_request": s["cached_tokens"] / requests,
+                    "cached_token_rate": (
+                        s["cached_tokens"] / s["prompt_tokens"] if s["prompt_tokens"] else 0.0
+                    )
+                }
+        return report
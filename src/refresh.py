@@ -0,0 +1,292 @@
+"""
+Incremental refresh of target.db from changed CSV files.
+
+A full build re-parses every CSV and replaces target.db. For a daily drop of
+new orders, refresh_database() instead:
+
+1. finds the CSVs whose hash differs from the build manifest
+2. stages each one in batches and keeps only new or changed rows, matched by
+   primary key (PRIMARY_KEYS) or, for tables without one, by content hash
+3. upserts them, one transaction per batch, and updates what depends on
+   them in the same transaction: the review text index, the geolocation
+   centroids of the affected zip prefixes and the stratified samples
+4. re-ANALYZEs the touched tables, bumps PRAGMA user_version and records a
+   new version for each touched table, so caches keyed on table versions
+   only drop what changed
+
+Rows are never deleted: a drop is treated as additions and corrections,
+and SQLiteBackend.initialize() refreshes the same way at startup rather
+than rebuilding from a drop. A full build replaces target.db with exactly
+the rows in data/csv, so apply deletions by putting a complete export
+there first and then removing target.db.
+
+Usage (from the repo root):
+    python -m src.refresh [--batch-rows 50000]
+"""
+
+import argparse
+import hashlib
+import sqlite3
+from pathlib import Path
+
+from src import snapshot, spatial, text_search
+from src.approximate import update_sample
+
+BATCH_ROWS = 50_000
+STAGE_TABLE = "_refresh_stage"
+
+# Olist tables; anything else is append-only, deduplicated by content hash
+PRIMARY_KEYS = {
+    "orders": ("order_id",),
+    "customers": ("customer_id",),
+    "sellers": ("seller_id",),
+    "products": ("product_id",),
+    "order_items": ("order_id", "order_item_id"),
+    "payments": ("order_id", "payment_sequential"),
+    "order_reviews": ("review_id", "order_id"),
+    "product_category_name_translation": ("product_category_name",),
+}
+
+
+def row_hash(*values):
+    # 3 and 3.0 hash alike: pandas may infer int in one batch, float in another
+    normalized = tuple(float(v) if isinstance(v, (int, float)) else v for v in values)
+    return hashlib.sha1(repr(normalized).encode("utf-8")).hexdigest()
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({_quote(table)})")]
+
+
+def _ensure_unique_key(conn, table, key):
+    """
+    Creates the unique index ON CONFLICT needs. False if the loaded data
+    has duplicate keys (the table is then refreshed by content hash).
+    """
+    try:
+        conn.execute(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {_quote('_pk_' + table)} "
+            f"ON {_quote(table)} ({', '.join(map(_quote, key))})"
+        )
+    except sqlite3.IntegrityError:
+        return False
+    return True
+
+
+def _hash_table(conn, table, columns):
+    """
+    Content hashes of every row already loaded, created on first use.
+    """
+    name = _quote(f"_row_hashes_{table}")
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (f"_row_hashes_{table}",)
+    ).fetchone()
+    if not exists:
+        conn.execute(f"CREATE TABLE {name} (hash TEXT PRIMARY KEY) WITHOUT ROWID")
+        conn.execute(
+            f"INSERT OR IGNORE INTO {name} "
+            f"SELECT row_hash({', '.join(map(_quote, columns))}) FROM {_quote(table)}"
+        )
+    return name
+
+
+def _refresh_batch(conn, table, columns, key, hashes):
+    """
+    Applies one staged batch. Returns (inserted, updated).
+    """
+    t = _quote(table)
+    col_list = ", ".join(map(_quote, columns))
+    stage_cols = set(_columns(conn, STAGE_TABLE))
+    # Table column order; columns missing from the CSV are NULL
+    values = [f"s.{_quote(c)}" if c in stage_cols else "NULL" for c in columns]
+    staged = ", ".join(f"{v} AS {_quote(c)}" for v, c in zip(values, columns))
+
+    conn.execute("DROP TABLE IF EXISTS temp.changed_rows")
+    if key:
+        on = " AND ".join(f"t.{_quote(k)} = s.{_quote(k)}" for k in key)
+        differs = " OR ".join(
+            f"s.{_quote(c)} IS NOT t.{_quote(c)}" for c in columns if c in stage_cols
+        )
+        conn.execute(f"""
+            CREATE TEMP TABLE changed_rows AS
+            SELECT {staged}, t.rowid AS _old_rowid
+            FROM {STAGE_TABLE} s LEFT JOIN {t} t ON {on}
+            WHERE t.rowid IS NULL OR {differs or "0"}
+        """)
+    else:
+        conn.execute(f"""
+            CREATE TEMP TABLE changed_rows AS
+            SELECT DISTINCT {staged}, NULL AS _old_rowid
+            FROM {STAGE_TABLE} s
+            WHERE row_hash({", ".join(values)}) NOT IN (SELECT hash FROM {hashes})
+        """)
+
+    updated = conn.execute(
+        "SELECT COUNT(*) FROM temp.changed_rows WHERE _old_rowid IS NOT NULL"
+    ).fetchone()[0]
+    total = conn.execute("SELECT COUNT(*) FROM temp.changed_rows").fetchone()[0]
+    if not total:
+        return 0, 0
+
+    old_rowids = "SELECT _old_rowid FROM temp.changed_rows WHERE _old_rowid IS NOT NULL"
+    max_rowid = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {t}").fetchone()[0]
+
+    if table == text_search.REVIEWS_TABLE:
+        # The FTS 'delete' command needs the text as it was indexed
+        text_search.index_rows(conn, old_rowids, delete=True)
+
+    if key:
+        assignments = ", ".join(
+            f"{_quote(c)} = excluded.{_quote(c)}" for c in columns if c not in key
+        )
+        conflict = f"DO UPDATE SET {assignments}" if assignments else "DO NOTHING"
+        conn.execute(f"""
+            INSERT INTO {t} ({col_list})
+            SELECT {col_list} FROM temp.changed_rows WHERE true
+            ON CONFLICT ({", ".join(map(_quote, key))}) {conflict}
+        """)
+    else:
+        conn.execute(f"INSERT INTO {t} ({col_list}) SELECT {col_list} FROM temp.changed_rows")
+        conn.execute(
+            f"INSERT OR IGNORE INTO {hashes} SELECT row_hash({col_list}) FROM temp.changed_rows"
+        )
+
+    # Updated rows keep their rowid; inserted ones are appended
+    touched = f"{old_rowids} UNION ALL SELECT rowid FROM {t} WHERE rowid > {max_rowid}"
+
+    if table == text_search.REVIEWS_TABLE:
+        text_search.index_rows(conn, touched)
+    if table == spatial.GEOLOCATION_TABLE:
+        spatial.refresh_centroids(
+            conn, "SELECT DISTINCT geolocation_zip_code_prefix FROM temp.changed_rows"
+        )
+
+    replaced = None
+    if key and updated:
+        replaced = (
+            [_quote(k) for k in key],
+            f"SELECT {', '.join(map(_quote, key))} FROM temp.changed_rows "
+            "WHERE _old_rowid IS NOT NULL"
+        )
+    update_sample(conn, table, touched, replaced)
+
+    return total - updated, updated
+
+
+def refresh_table(conn, table, csv_path, batch_rows=BATCH_ROWS):
+    """
+    Upserts the new / changed rows of one CSV. Returns (inserted, updated).
+    """
+    import pandas as pd
+
+    inserted = updated = 0
+    key = None
+    hashes = None
+
+    for chunk in pd.read_csv(csv_path, chunksize=batch_rows):
+        chunk.to_sql(STAGE_TABLE, conn, if_exists="replace", index=False)
+
+        columns = _columns(conn, table)
+        if not columns:
+            # New CSV: create the table with the staged column types
+            conn.execute(f"CREATE TABLE {_quote(table)} AS SELECT * FROM {STAGE_TABLE} WHERE 0")
+            columns = _columns(conn, table)
+
+        if key is None and hashes is None:
+            key = PRIMARY_KEYS.get(table)
+            if key and not (set(key) <= set(columns) and _ensure_unique_key(conn, table, key)):
+                key = None
+            if key is None:
+                hashes = _hash_table(conn, table, columns)
+
+        extra = set(_columns(conn, STAGE_TABLE)) - set(columns)
+        if extra:
+            print(f"{table}: ignoring columns not in the table: {', '.join(sorted(extra))}")
+
+        with conn:
+            batch_inserted, batch_updated = _refresh_batch(conn, table, columns, key, hashes)
+        inserted += batch_inserted
+        updated += batch_updated
+
+    conn.execute(f"DROP TABLE IF EXISTS {STAGE_TABLE}")
+    conn.execute("DROP TABLE IF EXISTS temp.changed_rows")
+    return inserted, updated
+
+
+def connect(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.create_function("row_hash", -1, row_hash, deterministic=True)
+    spatial.register_functions(conn)
+    return conn
+
+
+def refresh_database(db_path: Path, csv_dir: Path, batch_rows=BATCH_ROWS):
+    """
+    Applies changed CSVs to an existing target.db in place.
+    Returns {table: (inserted, updated)}, or None when target.db is
+    missing or from an older build format and needs a full build.
+    """
+    hashes = snapshot.csv_hashes(csv_dir)
+    manifest = snapshot.read_db_manifest(db_path)
+    if not manifest or manifest.get("_build_format") != hashes["_build_format"]:
+        return None
+
+    changed = [
+        name for name, sha in hashes.items()
+        if name != "_build_format" and manifest.get(name) != sha
+    ]
+    if not changed:
+        return {}
+
+    conn = connect(db_path)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0] + 1
+        results = {}
+
+        for name in changed:
+            table = Path(name).stem
+            results[table] = refresh_table(conn, table, Path(csv_dir) / name, batch_rows)
+
+            with conn:
+                conn.execute(f"ANALYZE {_quote(table)}")
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {snapshot.VERSIONS_TABLE} VALUES (?, ?)",
+                    (table, version)
+                )
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {snapshot.MANIFEST_TABLE} VALUES (?, ?)",
+                    (name, hashes[name])
+                )
+            print(f"Refreshed {table}: {results[table][0]} inserted, {results[table][1]} updated")
+
+        conn.execute(f"PRAGMA user_version = {version}")
+    finally:
+        conn.close()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply changed CSVs to target.db in place.")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS)
+    args = parser.parse_args()
+
+    from src.genai_sql_engine import CSV_DIR, DB_PATH, duckdb_enabled, get_backend
+
+    results = refresh_database(DB_PATH, CSV_DIR, args.batch_rows)
+    if results is None:
+        print("No current target.db to refresh; building it from scratch.")
+        get_backend("sqlite").initialize()
+    elif not results:
+        print("target.db is up to date.")
+
+    if duckdb_enabled():
+        get_backend("duckdb").initialize()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Compact, representative summaries of query results for the explainer.
+
+Instead of the first N rows, the LLM gets per-column statistics computed
+with NumPy (min / max / mean / quartiles, top values, trend slope for
+time-ordered results) plus a handful of representative rows: head, tail
+and the extremes of each numeric column, trimmed to a token budget.
+"""
+
+import re
+from collections import Counter
+
+# Rough token estimate used for budgeting (~4 characters per token)
+CHARS_PER_TOKEN = 4
+SUMMARY_TOKEN_BUDGET = 600
+HEAD_ROWS = 3
+TAIL_ROWS = 3
+TOP_K = 5
+
+_TIME_NAME = re.compile(r"(year|month|date|day|week|hour|time|period|quarter)", re.IGNORECASE)
+_TIME_VALUE = re.compile(r"^\d{4}(-\d{2}){0,2}([ T]\d{2}(:\d{2}){0,2})?$")
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _fmt(value):
+    if isinstance(value, float):
+        return f"{value:,.4g}" if abs(value) < 1e4 else f"{value:,.0f}"
+    return str(value)
+
+
+def _is_numeric(values):
+    seen = False
+    for v in values:
+        if v is None:
+            continue
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            return False
+        seen = True
+    return seen
+
+
+def _time_column(cols, columns):
+    """
+    Index of the column the result is ordered by in time, or None.
+    """
+    for i, name in enumerate(cols):
+        values = [v for v in columns[i] if v is not None]
+        if not values:
+            continue
+        looks_like_time = _TIME_NAME.search(name) or all(
+            _TIME_VALUE.match(str(v)) for v in values[:20]
+        )
+        if looks_like_time and values == sorted(values, key=str):
+            return i
+    return None
+
+
+def summarize_result(cols, rows, token_budget=SUMMARY_TOKEN_BUDGET) -> str:
+    if not rows:
+        return "No rows."
+
+    # Small results go through verbatim; stop serializing once over budget
+    lines, size = [], 0
+    for row in rows:
+        lines.append(str(row))
+        size += len(lines[-1]) + 1
+        if size // CHARS_PER_TOKEN > token_budget:
+            break
+    else:
+        return f"All {len(rows)} rows:\n" + "\n".join(lines)
+
+    import numpy as np
+
+    n = len(rows)
+    columns = list(zip(*rows))
+    stat_lines = []
+    numeric = {}
+
+    for i, name in enumerate(cols):
+        values = columns[i]
+        nulls = sum(v is None for v in values)
+
+        if _is_numeric(values):
+            arr = np.array([np.nan if v is None else v for v in values], dtype=float)
+            numeric[i] = arr
+            p25, p50, p75 = np.nanpercentile(arr, [25, 50, 75])
+            stat_lines.append(
+                f"- {name} (numeric): min {_fmt(float(np.nanmin(arr)))}, "
+                f"max {_fmt(float(np.nanmax(arr)))}, mean {_fmt(float(np.nanmean(arr)))}, "
+                f"p25 {_fmt(float(p25))}, median {_fmt(float(p50))}, p75 {_fmt(float(p75))}"
+                + (f", nulls {nulls}" if nulls else "")
+            )
+        else:
+            counts = Counter(v for v in values if v is not None)
+            top = ", ".join(f"{v} ({c})" for v, c in counts.most_common(TOP_K))
+            stat_lines.append(
+                f"- {name} (text): {len(counts)} distinct; top: {top}"
+                + (f"; nulls {nulls}" if nulls else "")
+            )
+
+    trend_lines = []
+    time_idx = _time_column(cols, columns)
+    if time_idx is not None:
+        x = np.arange(n, dtype=float)
+        for i, arr in numeric.items():
+            if i == time_idx:
+                continue
+            mask = ~np.isnan(arr)
+            if mask.sum() < 2:
+                continue
+            slope = np.polyfit(x[mask], arr[mask], 1)[0]
+            trend_lines.append(
+                f"- {cols[i]}: {slope:+,.4g} per step of {cols[time_idx]}"
+            )
+
+    # Representative rows: head, tail and each numeric column's extremes
+    picks = set(range(min(HEAD_ROWS, n))) | set(range(max(n - TAIL_ROWS, 0), n))
+    for arr in numeric.values():
+        if np.isnan(arr).all():
+            continue
+        picks.add(int(np.nanargmin(arr)))
+        picks.add(int(np.nanargmax(arr)))
+    sample = sorted(picks)
+
+    def render(sample, stat_lines):
+        parts = [f"Rows: {n} (columns: {', '.join(cols)})", "Column stats:", *stat_lines]
+        if trend_lines:
+            parts += ["Trend (time-ordered):", *trend_lines]
+        parts.append(f"Representative rows ({len(sample)} of {n}: head, tail, extremes):")
+        parts += [f"#{idx + 1}: {rows[idx]}" for idx in sample]
+        return "\n".join(parts)
+
+    text = render(sample, stat_lines)
+
+    # Over budget: drop middle sample rows first, then per-column stats
+    while estimate_tokens(text) > token_budget and len(sample) > 2:
+        sample.pop(len(sample) // 2)
+        text = render(sample, stat_lines)
+    while estimate_tokens(text) > token_budget and len(stat_lines) > 1:
+        stat_lines = stat_lines[:-1]
+        text = render(sample, stat_lines)
+
+    return text
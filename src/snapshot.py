@@ -0,0 +1,215 @@
+"""
+Prebuilt SQLite snapshots of data/csv.
+
+Building target.db means parsing every CSV with pandas, which dominates cold
+start in a fresh container. build_snapshot() does that once at image/build
+time and records a content hash of every source CSV. At startup the engine
+compares hashes and copies the snapshot instead of re-parsing, or skips
+work entirely when target.db was already built from the same CSVs.
+
+Usage (from the repo root):
+    python -m src.snapshot
+"""
+
+import argparse
+import hashlib
+import json
+import shutil
+import sqlite3
+from pathlib import Path
+
+from src import spatial, text_search
+from src.spatial import build_spatial_index
+from src.text_search import build_review_index
+
+MANIFEST_TABLE = "_build_manifest"
+VERSIONS_TABLE = "_table_versions"
+MANIFEST_FILE = "manifest.json"
+SNAPSHOT_DB = "target.db"
+
+# Bump when build_sqlite derives new tables so older builds are redone
+BUILD_FORMAT = 4
+
+# Derived table -> the loaded table it is built from
+DERIVED_TABLES = {
+    spatial.CENTROIDS_TABLE: spatial.GEOLOCATION_TABLE,
+    spatial.RTREE_TABLE: spatial.GEOLOCATION_TABLE,
+    text_search.FTS_TABLE: text_search.REVIEWS_TABLE,
+    text_search.VOCAB_TABLE: text_search.REVIEWS_TABLE,
+}
+
+
+def file_sha256(path: Path) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def csv_hashes(csv_dir: Path) -> dict:
+    hashes = {
+        csv_file.name: file_sha256(csv_file)
+        for csv_file in sorted(Path(csv_dir).glob("*.csv"))
+    }
+    # Recorded with the hashes so a DB from an older build never matches
+    hashes["_build_format"] = str(BUILD_FORMAT)
+    return hashes
+
+
+def initial_data_version(hashes: dict) -> int:
+    """
+    Data version (PRAGMA user_version) of a freshly built database.
+    Derived from the CSV hashes so different source data never shares a
+    version; refreshes bump it from there.
+    """
+    digest = hashlib.sha256(json.dumps(hashes, sort_keys=True).encode("utf-8"))
+    return int(digest.hexdigest()[:7], 16)
+
+
+def source_table(name: str) -> str:
+    """
+    The CSV-loaded table whose version covers `name`.
+    """
+    from src.approximate import SAMPLE_PREFIX
+
+    if name.startswith(SAMPLE_PREFIX):
+        return name[len(SAMPLE_PREFIX):]
+    return DERIVED_TABLES.get(name, name)
+
+
+def read_db_manifest(db_path: Path) -> dict:
+    """
+    CSV hashes a database was built from, or {} if unknown.
+    """
+    if not Path(db_path).exists():
+        return {}
+
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(f"SELECT name, sha256 FROM {MANIFEST_TABLE}").fetchall()
+    except sqlite3.Error:
+        return {}
+    finally:
+        conn.close()
+    return dict(rows)
+
+
+def read_snapshot_manifest(snapshot_dir: Path) -> dict:
+    path = Path(snapshot_dir) / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def build_sqlite(csv_dir: Path, db_path: Path, hashes: dict = None):
+    """
+    Loads every CSV into a fresh SQLite file and records the CSV hashes.
+    Written to a temp file first so readers never see a half-built DB.
+    """
+    import pandas as pd
+
+    from src.approximate import build_samples
+
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = db_path.with_suffix(".building")
+    tmp_path.unlink(missing_ok=True)
+
+    hashes = hashes if hashes is not None else csv_hashes(csv_dir)
+    conn = sqlite3.connect(tmp_path)
+
+    for csv_file in sorted(Path(csv_dir).glob("*.csv")):
+        table_name = csv_file.stem
+        df = pd.read_csv(csv_file)
+
+        df.to_sql(
+            table_name,
+            conn,
+            if_exists="replace",
+            index=False
+        )
+
+        print(f"Loaded table: {table_name}")
+
+    build_spatial_index(conn)
+    build_samples(conn)
+
+    version = initial_data_version(hashes)
+    conn.execute(f"CREATE TABLE {MANIFEST_TABLE} (name TEXT PRIMARY KEY, sha256 TEXT)")
+    conn.executemany(f"INSERT INTO {MANIFEST_TABLE} VALUES (?, ?)", hashes.items())
+
+    # Per-table data versions; refreshes bump only the tables they touch
+    conn.execute(f"CREATE TABLE {VERSIONS_TABLE} (table_name TEXT PRIMARY KEY, version INTEGER)")
+    conn.executemany(
+        f"INSERT INTO {VERSIONS_TABLE} VALUES (?, ?)",
+        [(csv_file.stem, version) for csv_file in sorted(Path(csv_dir).glob("*.csv"))]
+    )
+    conn.execute(f"PRAGMA user_version = {version}")
+    conn.commit()
+
+    # Planner statistics + compact file for the snapshot copy
+    conn.execute("ANALYZE")
+    conn.execute("VACUUM")
+
+    # External-content FTS maps to rowids, which VACUUM may renumber
+    build_review_index(conn)
+    conn.commit()
+    conn.close()
+
+    tmp_path.replace(db_path)
+
+
+def build_snapshot(csv_dir: Path, snapshot_dir: Path) -> dict:
+    snapshot_dir = Path(snapshot_dir)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+
+    hashes = csv_hashes(csv_dir)
+    db_path = snapshot_dir / SNAPSHOT_DB
+    build_sqlite(csv_dir, db_path, hashes)
+
+    manifest = {
+        "csv": hashes,
+        "snapshot": {SNAPSHOT_DB: file_sha256(db_path)}
+    }
+    (snapshot_dir / MANIFEST_FILE).write_text(
+        json.dumps(manifest, indent=2), encoding="utf-8"
+    )
+    return manifest
+
+
+def restore_snapshot(snapshot_dir: Path, db_path: Path, hashes: dict) -> bool:
+    """
+    Copies the snapshot to db_path if it was built from the same CSVs.
+    Returns False when there is no matching snapshot.
+    """
+    manifest = read_snapshot_manifest(snapshot_dir)
+    if not manifest or manifest.get("csv") != hashes:
+        return False
+
+    snapshot_db = Path(snapshot_dir) / SNAPSHOT_DB
+    if file_sha256(snapshot_db) != manifest["snapshot"][SNAPSHOT_DB]:
+        return False
+
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = db_path.with_suffix(".restoring")
+    shutil.copyfile(snapshot_db, tmp_path)
+    tmp_path.replace(db_path)
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the data/csv snapshot.")
+    parser.add_argument("--csv-dir", default="data/csv")
+    parser.add_argument("--snapshot-dir", default="data/snapshot")
+    args = parser.parse_args()
+
+    manifest = build_snapshot(Path(args.csv_dir), Path(args.snapshot_dir))
+    print(f"Snapshot built from {len(manifest['csv'])} CSV files.")
+
+    from src.genai_sql_engine import duckdb_enabled, get_backend
+
+    if duckdb_enabled():
+        get_backend("duckdb").initialize()
+
+
+if __name__ == "__main__":
+    main()
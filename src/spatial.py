@@ -0,0 +1,193 @@
+"""
+Spatial index over the geolocation table.
+
+geolocation has many lat/lng rows per zip code prefix and no index, so
+distance questions ("sellers within 50 km of customers") become quadratic
+joins. At build time we add:
+
+- geolocation_centroids: one row per zip prefix (mean lat/lng, main city/state)
+- geolocation_rtree: an R*Tree over the centroids, so a bounding-box
+  filter is an index range lookup instead of a scan
+
+and every connection gets haversine_km() plus the km_lat_delta() /
+km_lng_delta() helpers used to build the bounding box.
+"""
+
+import math
+
+GEOLOCATION_TABLE = "geolocation"
+CENTROIDS_TABLE = "geolocation_centroids"
+RTREE_TABLE = "geolocation_rtree"
+ZIP_INDEX = "_geolocation_zip"
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.195
+
+# Olist geolocation has a few points outside Brazil; keep them out of centroids
+LAT_RANGE = (-34.0, 5.5)
+LNG_RANGE = (-74.5, -32.0)
+
+SCHEMA_NOTES = f"""
+-- Spatial helpers (SQLite functions available in every query)
+--   haversine_km(lat1, lng1, lat2, lng2) -> great-circle distance in km
+--   km_lat_delta(km), km_lng_delta(km, lat) -> degrees spanned by km at that latitude
+-- {CENTROIDS_TABLE}: one row per zip prefix; join on
+--   customer_zip_code_prefix / seller_zip_code_prefix = zip_code_prefix.
+-- {RTREE_TABLE}: R*Tree over the centroids (id = zip_code_prefix).
+-- For distances between locations use haversine_km() on {CENTROIDS_TABLE}.
+-- For "within N km" questions, filter candidates through the R*Tree with a
+-- bounding box, then check the exact distance. Example, 50 km around
+-- latitude -23.55, longitude -46.63 (write the real point's numbers in
+-- place of these; queries take no parameters):
+--   SELECT c.zip_code_prefix
+--   FROM {RTREE_TABLE} r
+--   JOIN {CENTROIDS_TABLE} c ON c.zip_code_prefix = r.id
+--   WHERE r.min_lat >= -23.55 - km_lat_delta(50) AND r.max_lat <= -23.55 + km_lat_delta(50)
+--     AND r.min_lng >= -46.63 - km_lng_delta(50, -23.55)
+--     AND r.max_lng <= -46.63 + km_lng_delta(50, -23.55)
+--     AND haversine_km(-23.55, -46.63, c.lat, c.lng) <= 50
+-- Never join geolocation to itself or to orders directly; use {CENTROIDS_TABLE}.
+"""
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    if None in (lat1, lng1, lat2, lng2):
+        return None
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lng2 - lng1)
+    a = (
+        math.sin(d_phi / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def km_lat_delta(km):
+    if km is None:
+        return None
+    return km / KM_PER_DEGREE_LAT
+
+
+def km_lng_delta(km, lat):
+    if km is None or lat is None:
+        return None
+    # Widest at the pole-ward edge; clamp so the box never degenerates
+    cos_lat = max(math.cos(math.radians(abs(lat) + km_lat_delta(km))), 0.01)
+    return km / (KM_PER_DEGREE_LAT * cos_lat)
+
+
+def register_functions(conn):
+    """
+    Adds the spatial SQL functions to a connection (needed on every
+    connection, including read-only pooled ones).
+    """
+    conn.create_function("haversine_km", 4, haversine_km, deterministic=True)
+    conn.create_function("km_lat_delta", 1, km_lat_delta, deterministic=True)
+    conn.create_function("km_lng_delta", 2, km_lng_delta, deterministic=True)
+
+
+def _geolocation_columns(conn):
+    return {
+        row[1] for row in conn.execute(f"PRAGMA table_info({GEOLOCATION_TABLE})")
+    }
+
+
+def _insert_centroids(conn, zips_sql=None):
+    """
+    Aggregates geolocation into centroids, for every zip prefix or only
+    those selected by zips_sql.
+    """
+    if {"geolocation_city", "geolocation_state"} <= _geolocation_columns(conn):
+        city, state = "geolocation_city", "geolocation_state"
+    else:
+        city, state = "NULL", "NULL"
+
+    zip_filter = f"AND geolocation_zip_code_prefix IN ({zips_sql})" if zips_sql else ""
+    rtree_filter = f"WHERE zip_code_prefix IN ({zips_sql})" if zips_sql else ""
+
+    # Bare city/state next to MAX(n) take the values of the most common row
+    conn.execute(f"""
+        INSERT INTO {CENTROIDS_TABLE}
+        SELECT zip, lat, lng, city, state, points
+        FROM (
+            SELECT
+                zip, city, state, MAX(n),
+                SUM(lat_sum) / SUM(n) AS lat,
+                SUM(lng_sum) / SUM(n) AS lng,
+                SUM(n) AS points
+            FROM (
+                SELECT
+                    CAST(geolocation_zip_code_prefix AS INTEGER) AS zip,
+                    {city} AS city, {state} AS state,
+                    COUNT(*) AS n,
+                    SUM(geolocation_lat) AS lat_sum,
+                    SUM(geolocation_lng) AS lng_sum
+                FROM {GEOLOCATION_TABLE}
+                WHERE geolocation_lat BETWEEN ? AND ?
+                  AND geolocation_lng BETWEEN ? AND ?
+                  {zip_filter}
+                GROUP BY zip, city, state
+            )
+            GROUP BY zip
+        )
+    """, (*LAT_RANGE, *LNG_RANGE))
+
+    conn.execute(f"""
+        INSERT INTO {RTREE_TABLE}
+        SELECT zip_code_prefix, lat, lat, lng, lng FROM {CENTROIDS_TABLE}
+        {rtree_filter}
+    """)
+
+
+def build_spatial_index(conn):
+    """
+    (Re)builds the centroid table and its R*Tree from geolocation.
+    Does nothing when geolocation is not loaded.
+    """
+    conn.execute(f"DROP TABLE IF EXISTS {RTREE_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {CENTROIDS_TABLE}")
+
+    columns = _geolocation_columns(conn)
+    if not {"geolocation_zip_code_prefix", "geolocation_lat", "geolocation_lng"} <= columns:
+        return
+
+    conn.execute(f"""
+        CREATE TABLE {CENTROIDS_TABLE} (
+            zip_code_prefix INTEGER PRIMARY KEY,
+            lat REAL NOT NULL,
+            lng REAL NOT NULL,
+            city TEXT,
+            state TEXT,
+            points INTEGER NOT NULL
+        )
+    """)
+    conn.execute(
+        f"CREATE VIRTUAL TABLE {RTREE_TABLE} USING rtree(id, min_lat, max_lat, min_lng, max_lng)"
+    )
+    # Lets refresh_centroids() re-aggregate a few zip prefixes without a scan
+    conn.execute(
+        f"CREATE INDEX IF NOT EXISTS {ZIP_INDEX} "
+        f"ON {GEOLOCATION_TABLE} (geolocation_zip_code_prefix)"
+    )
+    _insert_centroids(conn)
+
+    count = conn.execute(f"SELECT COUNT(*) FROM {CENTROIDS_TABLE}").fetchone()[0]
+    print(f"Built spatial index: {count} zip prefixes")
+
+
+def refresh_centroids(conn, zips_sql):
+    """
+    Recomputes the centroids (and R*Tree entries) of the zip prefixes
+    selected by zips_sql, e.g. after new geolocation rows were added.
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (CENTROIDS_TABLE,)
+    ).fetchone()
+    if not exists:
+        build_spatial_index(conn)
+        return
+
+    conn.execute(f"DELETE FROM {RTREE_TABLE} WHERE id IN ({zips_sql})")
+    conn.execute(f"DELETE FROM {CENTROIDS_TABLE} WHERE zip_code_prefix IN ({zips_sql})")
+    _insert_centroids(conn, zips_sql)
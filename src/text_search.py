@@ -0,0 +1,99 @@
+"""
+Full-text index over review titles and messages.
+
+Text questions ("reviews mentioning late delivery") otherwise become
+LIKE '%...%' scans of order_reviews, which no index can serve. At build
+time we add:
+
+- order_reviews_fts: an external-content FTS5 index over the review text
+  (rowid = order_reviews.rowid, so the text is not stored twice)
+- order_reviews_vocab: fts5vocab view of the index, for word frequencies
+
+Review text is Portuguese. There is no Portuguese stemmer in SQLite, so the
+unicode61 tokenizer folds case and accents ("não" matches "nao") and prefix
+indexes make stem-like prefix queries ("atras*") cheap.
+"""
+
+REVIEWS_TABLE = "order_reviews"
+FTS_TABLE = "order_reviews_fts"
+VOCAB_TABLE = "order_reviews_vocab"
+TEXT_COLUMNS = ("review_comment_title", "review_comment_message")
+
+TOKENIZER = "unicode61 remove_diacritics 2"
+PREFIX_LENGTHS = "3 4 5"
+
+SCHEMA_NOTES = f"""
+-- Full-text search over review text (Portuguese; case and accents ignored)
+-- {FTS_TABLE}: FTS5 index of {REVIEWS_TABLE}.{TEXT_COLUMNS[0]} and
+--   {REVIEWS_TABLE}.{TEXT_COLUMNS[1]}; {FTS_TABLE}.rowid = {REVIEWS_TABLE}.rowid.
+-- Use MATCH instead of LIKE '%...%' and rank with bm25() (lower = more relevant):
+--   SELECT r.review_id, r.review_score, bm25({FTS_TABLE}) AS relevance
+--   FROM {FTS_TABLE} f
+--   JOIN {REVIEWS_TABLE} r ON r.rowid = f.rowid
+--   WHERE {FTS_TABLE} MATCH 'atras* OR "nao recebi"'
+--   ORDER BY relevance
+--   LIMIT 20
+-- Query syntax: word, prefix*, "exact phrase", a AND b, a OR b, a NOT b,
+--   NEAR(a b, 5), {TEXT_COLUMNS[0]} : word. Search terms must be Portuguese.
+-- {VOCAB_TABLE}(term, doc, cnt): every indexed word with the number of
+--   reviews (doc) and occurrences (cnt) - use it for "most common words".
+"""
+
+
+def _columns(conn, table):
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def build_review_index(conn):
+    """
+    (Re)builds the FTS5 index and vocabulary view from order_reviews.
+    Run after VACUUM: VACUUM may renumber the rowids the index points at.
+    Does nothing when order_reviews or its text columns are missing.
+    """
+    conn.execute(f"DROP TABLE IF EXISTS {VOCAB_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    if not set(TEXT_COLUMNS) <= _columns(conn, REVIEWS_TABLE):
+        return
+
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+            {", ".join(TEXT_COLUMNS)},
+            content='{REVIEWS_TABLE}',
+            content_rowid='rowid',
+            tokenize='{TOKENIZER}',
+            prefix='{PREFIX_LENGTHS}'
+        )
+    """)
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    conn.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    conn.execute(f"CREATE VIRTUAL TABLE {VOCAB_TABLE} USING fts5vocab({FTS_TABLE}, 'row')")
+
+    count = conn.execute(f"SELECT COUNT(*) FROM {VOCAB_TABLE}").fetchone()[0]
+    print(f"Built review text index: {count} distinct words")
+
+
+def index_rows(conn, rowids_sql, delete=False):
+    """
+    Adds the order_reviews rows selected by rowids_sql to the index, or
+    removes them (delete=True, while they still hold the indexed text).
+    """
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?", (FTS_TABLE,)
+    ).fetchone()
+    if not exists:
+        return
+
+    columns = ", ".join(TEXT_COLUMNS)
+    if delete:
+        conn.execute(f"""
+            INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns})
+            SELECT 'delete', rowid, {columns} FROM {REVIEWS_TABLE}
+            WHERE rowid IN ({rowids_sql})
+        """)
+    else:
+        conn.execute(f"""
+            INSERT INTO {FTS_TABLE}(rowid, {columns})
+            SELECT rowid, {columns} FROM {REVIEWS_TABLE}
+            WHERE rowid IN ({rowids_sql})
+        """)
@@ -0,0 +1,133 @@
+import threading
+import time
+import pytest
+from src.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    SingleFlight,
+    TokenBucket
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+# -------------------------
+# Token bucket
+# -------------------------
+
+def test_token_bucket_refills_over_time():
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+
+    bucket.take()
+    bucket.take()
+    assert bucket.wait_time() == 0.5
+
+    clock.now = 0.5
+    assert bucket.wait_time() == 0
+
+# -------------------------
+# Request coalescing
+# -------------------------
+
+def test_single_flight_shares_one_call():
+    flight = SingleFlight()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append(1)
+        release.wait(2)
+        return "result"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(flight.do("q", slow)))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    while flight.coalesced < 4:
+        time.sleep(0.01)
+    release.set()
+    for t in threads:
+        t.join()
+
+    assert calls == [1]
+    assert results == ["result"] * 5
+
+# -------------------------
+# Admission limits
+# -------------------------
+
+def test_user_limit_rejects_without_queueing():
+    controller = AdmissionController(user_rate=0.001, user_burst=2, max_wait=1)
+
+    controller.acquire("alice")
+    controller.acquire("alice")
+    with pytest.raises(AdmissionRejected):
+        controller.acquire("alice")
+
+    controller.acquire("bob")
+    assert controller.metrics()["admitted"] == 3
+    assert controller.metrics()["rejected"] == 1
+
+
+def test_global_burst_queues_instead_of_failing():
+    controller = AdmissionController(llm_rate=50, llm_burst=1, max_wait=2)
+
+    start = time.monotonic()
+    for _ in range(3):
+        controller.charge("llm")
+
+    assert time.monotonic() - start >= 0.03
+    assert controller.metrics()["queue_wait_max_ms"] > 0
+
+
+def test_admission_does_not_charge_global_capacity():
+    controller = AdmissionController(llm_rate=0.001, llm_burst=1, max_wait=0.05)
+
+    # Fast-path answers and cache hits never reach the LLM
+    for user in ("a", "b", "c"):
+        controller.run(user, user, lambda: "cached")
+
+    assert controller.charge("llm")
+    assert not controller.charge("llm", blocking=False)
+    with pytest.raises(AdmissionRejected):
+        controller.charge("llm")
+    assert controller.charge("sqlite")
+
+
+def test_followers_are_admitted_on_their_own():
+    controller = AdmissionController(user_rate=0.001, user_burst=1, max_wait=0.05)
+    controller.acquire("alice")  # alice is out of tokens
+    release = threading.Event()
+    results = []
+
+    def leader():
+        controller._flight.do("q", lambda: release.wait(2) and "result")
+
+    t = threading.Thread(target=leader)
+    t.start()
+    while "q" not in controller._flight._calls:
+        time.sleep(0.01)
+
+    # bob joins the flight with his own token; alice is refused up front
+    follower = threading.Thread(
+        target=lambda: results.append(controller.run("bob", "q", lambda: "own run"))
+    )
+    follower.start()
+    while controller._flight.coalesced < 1:
+        time.sleep(0.01)
+    with pytest.raises(AdmissionRejected):
+        controller.run("alice", "q", lambda: "own run")
+
+    release.set()
+    follower.join()
+    t.join()
+    assert results == ["result"]
@@ -0,0 +1,118 @@
+import random
+import sqlite3
+
+import pytest
+import src.approximate as approximate
+from src.approximate import (
+    add_confidence_intervals,
+    build_samples,
+    estimate_sql,
+    is_estimate,
+    read_sample_manifest
+)
+
+STATES = ["SP", "RJ", "MG", "AC"]
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    monkeypatch.setattr(approximate, "MIN_SAMPLED_TABLE_ROWS", 1000)
+    monkeypatch.setattr(approximate, "SAMPLE_RATE", 0.1)
+
+    rng = random.Random(7)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE orders (order_id INTEGER, customer_state TEXT, freight REAL)")
+    conn.executemany(
+        "INSERT INTO orders VALUES (?, ?, ?)",
+        [
+            # AC is a small stratum; it must still be sampled heavily
+            (i, "AC" if i % 200 == 0 else rng.choice(STATES[:3]), rng.uniform(5, 50))
+            for i in range(40_000)
+        ]
+    )
+    conn.execute("CREATE TABLE states (customer_state TEXT, region TEXT)")
+    conn.executemany("INSERT INTO states VALUES (?, ?)", [(s, "x") for s in STATES])
+    build_samples(conn, {"orders": ["customer_state"], "states": ["customer_state"]})
+    yield conn
+    conn.close()
+
+
+def covers(value, low, high, slack=0.0):
+    # Sampling is random: allow two CI half-widths so the test doesn't flake
+    middle, half = (low + high) / 2, (high - low) / 2
+    return abs(value - middle) <= 2 * half + slack
+
+
+def run_estimate(conn, sql):
+    estimate = estimate_sql(sql, read_sample_manifest(conn))
+    assert estimate is not None
+    cur = conn.execute(estimate.sql)
+    cols = [d[0] for d in cur.description]
+    return add_confidence_intervals(estimate, cols, cur.fetchall())
+
+# -------------------------
+# Build
+# -------------------------
+
+def test_build_samples_keeps_small_strata(conn):
+    assert read_sample_manifest(conn) == {"orders": 40_000}
+
+    per_state = dict(conn.execute(
+        "SELECT customer_state, COUNT(*) FROM _sample_orders GROUP BY customer_state"
+    ).fetchall())
+    assert per_state["AC"] == 200  # below MIN_STRATUM_ROWS -> kept whole
+    assert 1_000 < per_state["SP"] < 1_700
+
+# -------------------------
+# Estimates
+# -------------------------
+
+def test_estimates_cover_exact_answer(conn):
+    sql = """
+    SELECT customer_state, COUNT(*) AS n, SUM(freight) AS total, ROUND(AVG(freight), 2) AS avg_freight
+    FROM orders
+    GROUP BY customer_state
+    ORDER BY customer_state
+    """
+    exact = {row[0]: row[1:] for row in conn.execute(sql)}
+    cols, rows = run_estimate(conn, sql)
+
+    assert cols == [
+        "customer_state", "n", "total", "avg_freight",
+        "n_ci_low", "n_ci_high", "total_ci_low", "total_ci_high",
+        "avg_freight_ci_low", "avg_freight_ci_high"
+    ]
+    assert is_estimate(cols)
+
+    for row in rows:
+        n, total, avg = exact[row[0]]
+        assert covers(n, row[4], row[5])
+        assert covers(total, row[6], row[7])
+        assert covers(avg, row[8], row[9], slack=0.01)
+
+
+def test_join_keeps_dimension_table_exact(conn):
+    sql = """
+    SELECT s.region, COUNT(*) AS n
+    FROM orders o JOIN states s ON o.customer_state = s.customer_state
+    GROUP BY s.region
+    """
+    cols, rows = run_estimate(conn, sql)
+
+    assert "_sample_orders AS o" in estimate_sql(sql, {"orders": 40_000}).sql
+    assert covers(40_000, rows[0][2], rows[0][3])
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT customer_state FROM orders",
+    "SELECT COUNT(DISTINCT customer_state) FROM orders",
+    "SELECT MAX(freight) FROM orders",
+    "SELECT COUNT(*) FROM states",
+    "WITH t AS (SELECT * FROM orders) SELECT COUNT(*) FROM t",
+    # aggregates inside larger expressions would get no interval
+    "SELECT customer_state, COUNT(*) * 100.0 / 1000 AS pct FROM orders GROUP BY customer_state",
+    "SELECT SUM(freight) / COUNT(*) AS avg_freight FROM orders",
+    "SELECT COUNT(*) AS n, SUM(freight) / COUNT(*) AS avg_freight FROM orders",
+])
+def test_ineligible_queries_are_not_rewritten(sql):
+    assert estimate_sql(sql, {"orders": 40_000}) is None
@@ -0,0 +1,149 @@
+import pytest
+from src.backends import (
+    SQLiteBackend,
+    DuckDBBackend,
+    referenced_tables,
+    route_query,
+    to_duckdb_sql
+)
+
+ORDERS_CSV = (
+    "order_id,order_purchase_timestamp,order_delivered_customer_date\n"
+    "a,2017-01-02 10:00:00,2017-01-05 10:00:00\n"
+    "b,2018-03-04 11:00:00,2018-03-06 11:00:00\n"
+)
+
+AGGREGATE_SQL = """
+SELECT
+    strftime('%Y', order_purchase_timestamp) AS order_year,
+    COUNT(*) AS total_orders,
+    AVG(JULIANDAY(order_delivered_customer_date) - JULIANDAY(order_purchase_timestamp)) AS days
+FROM orders
+GROUP BY order_year
+ORDER BY order_year
+"""
+
+
+PRODUCTS_CSV = (
+    "product_id,product_category_name,product_photos_qty\n"
+    "p1,Beleza,3\n"
+    "p2,,5\n"
+    "p3,beleza,2\n"
+)
+
+
+@pytest.fixture
+def csv_dir(tmp_path):
+    csv = tmp_path / "csv"
+    csv.mkdir()
+    (csv / "orders.csv").write_text(ORDERS_CSV)
+    (csv / "products.csv").write_text(PRODUCTS_CSV)
+    return csv
+
+# -------------------------
+# Dialect shim
+# -------------------------
+
+def test_to_duckdb_sql_rewrites_sqlite_functions():
+    sql = to_duckdb_sql("SELECT strftime('%Y', o.ts), JULIANDAY(o.ts) FROM orders o;")
+
+    assert "strftime(CAST(o.ts AS TIMESTAMP), '%Y')" in sql
+    assert "julian(CAST(o.ts AS TIMESTAMP))" in sql
+    assert not sql.endswith(";")
+
+
+def test_referenced_tables_ignores_ctes():
+    sql = "WITH t AS (SELECT * FROM orders) SELECT * FROM t JOIN customers c ON 1=1"
+    assert referenced_tables(sql) == {"orders", "customers"}
+
+# -------------------------
+# Routing
+# -------------------------
+
+def test_route_query_without_duckdb_uses_sqlite(tmp_path, csv_dir):
+    sqlite_backend = SQLiteBackend(tmp_path / "target.db", csv_dir)
+    sqlite_backend.initialize()
+
+    assert route_query(AGGREGATE_SQL, sqlite_backend, None) is sqlite_backend
+
+
+def test_duckdb_matches_sqlite_and_takes_aggregates(tmp_path, csv_dir):
+    pytest.importorskip("duckdb")
+
+    sqlite_backend = SQLiteBackend(tmp_path / "target.db", csv_dir)
+    sqlite_backend.initialize()
+    duckdb_backend = DuckDBBackend(tmp_path / "parquet", tmp_path / "target.db")
+    duckdb_backend.initialize()
+
+    assert duckdb_backend.execute(AGGREGATE_SQL) == sqlite_backend.execute(AGGREGATE_SQL)
+    assert route_query(AGGREGATE_SQL, sqlite_backend, duckdb_backend) is duckdb_backend
+
+    lookup = "SELECT order_id FROM orders WHERE order_id = 'a'"
+    assert route_query(lookup, sqlite_backend, duckdb_backend) is sqlite_backend
+
+
+@pytest.mark.parametrize("sql", [
+    # integer division
+    "SELECT product_id, product_photos_qty / 2 FROM products ORDER BY product_id",
+    # case-insensitive LIKE
+    "SELECT COUNT(*) FROM products WHERE product_category_name LIKE 'beleza'",
+    "SELECT COUNT(*) FROM products WHERE product_category_name NOT LIKE 'BELEZA'",
+    # NULLs sort first ascending, last descending
+    "SELECT product_category_name FROM products ORDER BY product_category_name",
+    "SELECT product_category_name FROM products ORDER BY product_category_name DESC",
+    # julianday counts from noon
+    "SELECT order_id, JULIANDAY(order_purchase_timestamp) FROM orders ORDER BY order_id",
+])
+def test_duckdb_answers_like_sqlite(tmp_path, csv_dir, sql):
+    pytest.importorskip("duckdb")
+
+    sqlite_backend = SQLiteBackend(tmp_path / "target.db", csv_dir)
+    sqlite_backend.initialize()
+    duckdb_backend = DuckDBBackend(tmp_path / "parquet", tmp_path / "target.db")
+    duckdb_backend.initialize()
+
+    assert duckdb_backend.execute(sql)[1] == sqlite_backend.execute(sql)[1]
+
+
+def test_like_rewrite_leaves_literals_alone():
+    sql = to_duckdb_sql("SELECT 'LIKE' AS \"LIKE\" FROM t WHERE a LIKE 'x'")
+    assert sql == "SELECT 'LIKE' AS \"LIKE\" FROM t WHERE a ILIKE 'x'"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT strftime('%Y-%m', order_purchase_timestamp, 'start of month') AS m, COUNT(*) FROM orders GROUP BY m",
+    "SELECT AVG(julianday('now') - julianday(order_purchase_timestamp)) FROM orders",
+    "SELECT date(order_purchase_timestamp) AS d, COUNT(*) FROM orders GROUP BY d ORDER BY d",
+])
+def test_untranslatable_date_calls_stay_on_sqlite(tmp_path, csv_dir, sql):
+    pytest.importorskip("duckdb")
+
+    sqlite_backend = SQLiteBackend(tmp_path / "target.db", csv_dir)
+    sqlite_backend.initialize()
+    duckdb_backend = DuckDBBackend(tmp_path / "parquet", tmp_path / "target.db")
+    duckdb_backend.initialize()
+
+    assert not duckdb_backend.can_execute(sql)
+    assert route_query(sql, sqlite_backend, duckdb_backend) is sqlite_backend
+    sqlite_backend.execute(sql)
+
+
+def test_auto_mode_falls_back_to_sqlite_on_duckdb_errors(monkeypatch):
+    import src.genai_sql_engine as engine
+
+    class Backend:
+        def __init__(self, name, result):
+            self.name, self.result = name, result
+
+        def execute(self, sql):
+            if isinstance(self.result, Exception):
+                raise self.result
+            return self.result
+
+    sqlite = Backend("sqlite", (["n"], [(1,)]))
+    duckdb = Backend("duckdb", RuntimeError("SQL execution failed: Binder Error"))
+    monkeypatch.setattr(engine, "SQL_BACKEND", "auto")
+    monkeypatch.setattr(engine, "get_backend", lambda name="sqlite": sqlite)
+    monkeypatch.setattr(engine, "route_query", lambda *args, **kwargs: duckdb)
+
+    assert engine._run_sql("SELECT COUNT(*) AS n FROM orders") == (["n"], [(1,)])
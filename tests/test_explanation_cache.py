@@ -0,0 +1,44 @@
+from types import SimpleNamespace
+import src.genai_sql_engine as engine
+from src.explanation_cache import ExplanationCache, result_fingerprint
+
+
+def fake_client(calls):
+    def create(**kwargs):
+        calls.append(kwargs)
+        message = SimpleNamespace(content="Insights:\n- Orders grew\nRecommendations:\n- Stock up")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+# -------------------------
+# explain_result reuse
+# -------------------------
+
+def test_explain_result_reuses_identical_results(monkeypatch):
+    calls = []
+    monkeypatch.setattr(engine, "get_client", lambda: fake_client(calls))
+    monkeypatch.setattr(engine, "get_data_version", lambda: 1)
+    monkeypatch.setattr(engine, "explanation_cache", ExplanationCache())
+
+    first = engine.explain_result("Orders per year?", ["y", "n"], [("2017", 5)])
+    second = engine.explain_result("  orders PER year?", ["y", "n"], [("2017", 5)])
+    engine.explain_result("Orders per year?", ["y", "n"], [("2017", 6)])
+
+    assert first == second == {"insights": ["Orders grew"], "recommendations": ["Stock up"]}
+    assert len(calls) == 2
+
+# -------------------------
+# Bounds and invalidation
+# -------------------------
+
+def test_cache_is_bounded_and_tied_to_data_version():
+    cache = ExplanationCache(max_entries=2)
+    explanation = {"insights": ["a"], "recommendations": []}
+
+    for i in range(3):
+        cache.put(result_fingerprint("q", ["c"], [(i,)]), 1, explanation)
+
+    assert cache.get(result_fingerprint("q", ["c"], [(0,)]), 1) is None
+    assert cache.get(result_fingerprint("q", ["c"], [(2,)]), 1) == explanation
+    assert cache.get(result_fingerprint("q", ["c"], [(2,)]), 2) is None
@@ -0,0 +1,144 @@
+import sqlite3
+
+import pytest
+import src.genai_sql_engine as engine
+from src.backends import SQLitePool
+from src.followup import FollowupManager, inline_previous
+
+ORDERS_SQL = """
+    SELECT customer_state, COUNT(*) AS total_orders
+    FROM orders
+    GROUP BY customer_state
+    ORDER BY customer_state
+"""
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def pool(tmp_path):
+    db_path = tmp_path / "target.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE orders (order_id TEXT, customer_state TEXT)")
+    conn.executemany(
+        "INSERT INTO orders VALUES (?, ?)",
+        [(f"o{i}", state) for i, state in enumerate(["SP"] * 5 + ["RJ"] * 3 + ["MG"] * 2)]
+    )
+    conn.commit()
+    conn.close()
+    return SQLitePool(db_path, size=2)
+
+
+def execute_with(pool):
+    def execute(sql):
+        with pool.connection() as conn:
+            cursor = conn.execute(sql)
+            return [d[0] for d in cursor.description], cursor.fetchall()
+    return execute
+
+
+def remember_orders(manager, pool, session_id="s1"):
+    cols, rows = execute_with(pool)(ORDERS_SQL)
+    manager.remember(session_id, "orders per state", ORDERS_SQL, cols, rows)
+
+
+FOLLOWUP_SQL = (
+    "SELECT customer_state, total_orders FROM prev_result "
+    "WHERE total_orders > 2 ORDER BY total_orders DESC"
+)
+
+
+def no_base_query(sql):
+    raise AssertionError("follow-up should not rescan the base tables")
+
+
+def test_remember_copies_nothing_until_a_followup(pool):
+    manager = FollowupManager(lambda: pool)
+    remember_orders(manager, pool)
+
+    assert manager.stats()["pinned"] == 0
+    assert "customer_state TEXT" in manager.describe("s1")
+    assert "total_orders INTEGER" in manager.describe("s1")
+
+    full_sql, cols, rows, relative = manager.execute("s1", FOLLOWUP_SQL, no_base_query)
+
+    assert manager.stats()["pinned"] == 1
+    assert cols == ["customer_state", "total_orders"]
+    assert rows == [("SP", 5), ("RJ", 3)]
+    # The stored SQL stands on its own
+    assert execute_with(pool)(full_sql)[1] == rows
+
+    # The next table is built from the pinned one, not the base tables
+    manager.remember("s1", "busy states", full_sql, cols, rows, relative)
+    _, _, rows, _ = manager.execute(
+        "s1", "SELECT customer_state FROM prev_result WHERE total_orders < 5", no_base_query
+    )
+    assert rows == [("RJ",)]
+    assert manager.stats()["materializations"] == 2
+
+
+def test_large_results_fall_back_to_cte(pool):
+    manager = FollowupManager(lambda: pool, max_rows=2)
+    remember_orders(manager, pool)
+
+    full_sql, _, rows, relative = manager.execute("s1", FOLLOWUP_SQL, execute_with(pool))
+
+    assert manager.stats()["pinned"] == 0
+    assert full_sql.startswith("WITH prev_result AS (")
+    assert relative is None
+    assert rows == [("SP", 5), ("RJ", 3)]
+
+
+def test_least_recent_session_gives_back_its_connection(pool):
+    manager = FollowupManager(lambda: pool, max_pinned=1)
+    remember_orders(manager, pool, "s1")
+    remember_orders(manager, pool, "s2")
+    manager.execute("s1", FOLLOWUP_SQL, no_base_query)
+    manager.execute("s2", FOLLOWUP_SQL, no_base_query)
+
+    assert manager.stats()["pinned"] == 1
+
+    # s1 lost its temp table but still answers through the CTE
+    _, _, rows, _ = manager.execute("s1", FOLLOWUP_SQL, execute_with(pool))
+    assert rows == [("SP", 5), ("RJ", 3)]
+
+
+def test_idle_sessions_are_evicted_and_release_the_pool(pool):
+    clock = Clock()
+    manager = FollowupManager(lambda: pool, idle_timeout=60, clock=clock)
+    remember_orders(manager, pool, "s1")
+    manager.execute("s1", FOLLOWUP_SQL, no_base_query)
+
+    clock.now = 61
+    assert not manager.has_context("s1")
+
+    stats = manager.stats()
+    assert (stats["sessions"], stats["pinned"], stats["evicted"]) == (0, 0, 1)
+    # Both pool slots are free again
+    conns = [pool.acquire(timeout=0), pool.acquire(timeout=0)]
+    for conn in conns:
+        pool.release(conn)
+
+
+def test_inline_previous_merges_with_clauses():
+    sql = inline_previous(
+        "WITH top AS (SELECT * FROM prev_result LIMIT 1) SELECT * FROM top;",
+        "SELECT 1 AS a;"
+    )
+
+    assert sql == (
+        "WITH prev_result AS (\nSELECT 1 AS a\n),\n"
+        "top AS (SELECT * FROM prev_result LIMIT 1) SELECT * FROM top"
+    )
+    assert sqlite3.connect(":memory:").execute(sql).fetchall() == [(1,)]
+
+
+def test_followups_need_an_explicit_session():
+    with pytest.raises(ValueError):
+        engine.run_admitted("p", "schema", "only SP", user_id="api", followup=True)
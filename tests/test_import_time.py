@@ -0,0 +1,22 @@
+from src.bench_import_time import (
+    DEFERRED_MODULES,
+    IMPORT_BUDGET_MS,
+    measure_import
+)
+
+
+def test_engine_import_defers_heavy_modules():
+    timings = measure_import("src.genai_sql_engine")
+
+    for module in DEFERRED_MODULES:
+        assert module not in timings, f"{module} imported at engine import time"
+
+
+def test_engine_import_within_budget():
+    # Best of three to keep the check stable on noisy CI machines
+    best_us = min(
+        measure_import("src.genai_sql_engine")["src.genai_sql_engine"][1]
+        for _ in range(3)
+    )
+
+    assert best_us / 1000 < IMPORT_BUDGET_MS
@@ -0,0 +1,72 @@
+import pytest
+import src.genai_sql_engine as engine
+from src.admission import AdmissionRejected
+from src.genai_sql_engine import run_safe_sql, validate_sql
+from src.intent_router import match_intent
+
+CORPUS_MATCHES = {
+    "How many orders were placed in each year?": "count_by_period",
+    "Number of reviews per month": "count_by_period",
+    "How many sellers are there in each state?": "count_by_dimension",
+    "Show me the top five product categories by sales": "top_by_revenue",
+    "Average delivery time by state": "avg_delivery_time",
+}
+
+# -------------------------
+# Matching
+# -------------------------
+
+@pytest.mark.parametrize("question,intent", CORPUS_MATCHES.items())
+def test_match_intent_recognizes_templates(question, intent):
+    match = match_intent(question)
+
+    assert match is not None and match.intent == intent
+    assert validate_sql(match.sql)
+
+
+@pytest.mark.parametrize("question", [
+    "Which sellers have the best review scores?",
+    "How many orders were placed in each year for SP only?",
+    "Top 500 categories by revenue",
+])
+def test_match_intent_falls_through(question):
+    assert match_intent(question) is None
+
+# -------------------------
+# run_safe_sql skips the LLM
+# -------------------------
+
+def test_run_safe_sql_uses_fast_path(monkeypatch):
+    def no_llm(*args, **kwargs):
+        raise AssertionError("LLM called for a templated question")
+
+    question = "How many orders were placed in each year?"
+    sql = match_intent(question).sql
+
+    monkeypatch.setattr("src.genai_sql_engine.generate_sql", no_llm)
+    monkeypatch.setattr(
+        "src.genai_sql_engine.execute_sql",
+        lambda sql: (["order_year", "total_orders"], [("2017", 10)])
+    )
+    monkeypatch.setitem(engine._fast_path_checked, sql, True)
+
+    result_sql, cols, rows = run_safe_sql(prompt="", schema="", question=question)
+
+    assert result_sql == sql
+    assert rows == [("2017", 10)]
+
+
+def test_fast_path_rejection_does_not_fall_through_to_llm(monkeypatch):
+    def no_llm(*args, **kwargs):
+        raise AssertionError("LLM called after SQLite capacity ran out")
+
+    def rejected(sql):
+        raise AdmissionRejected("busy")
+
+    question = "How many orders were placed in each year?"
+    monkeypatch.setattr("src.genai_sql_engine.generate_sql", no_llm)
+    monkeypatch.setattr("src.genai_sql_engine.execute_sql", rejected)
+    monkeypatch.setitem(engine._fast_path_checked, match_intent(question).sql, True)
+
+    with pytest.raises(AdmissionRejected):
+        run_safe_sql(prompt="", schema="", question=question)
@@ -0,0 +1,229 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from openai import OpenAI
+import src.genai_sql_engine as engine
+from src.explanation_cache import ExplanationCache
+from src.llm_client import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LLMUnavailable,
+    ResilientLLMClient
+)
+
+# -------------------------
+# Local fake OpenAI server
+# -------------------------
+
+class FakeLLMServer:
+    """
+    Serves /v1/chat/completions. Each request pops the next scripted
+    action: ("ok", delay_s) or ("error", status); "ok" once empty.
+    """
+
+    def __init__(self):
+        self.actions = []
+        self.requests = 0
+        self.lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers["Content-Length"]))
+                with server.lock:
+                    server.requests += 1
+                    kind, arg = server.actions.pop(0) if server.actions else ("ok", 0)
+
+                if kind == "error":
+                    self._send(arg, {"error": {"message": "injected", "type": "server_error"}})
+                    return
+
+                time.sleep(arg)
+                self._send(200, {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": "gpt-4o-mini",
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "SELECT 1"},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": {"prompt_tokens": 5, "completion_tokens": 2, "total_tokens": 7}
+                })
+
+            def _send(self, status, body):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/v1"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def server():
+    fake = FakeLLMServer()
+    yield fake
+    fake.httpd.shutdown()
+
+
+def make_client(server, **kwargs):
+    openai_client = OpenAI(api_key="test", base_url=server.url, max_retries=0)
+    kwargs.setdefault("backoff_base", 0.01)
+    return ResilientLLMClient(lambda: openai_client, **kwargs)
+
+
+def ask(client, deadline=5.0):
+    response = client.create(
+        deadline=deadline,
+        model="gpt-4o-mini",
+        messages=[{"role": "user", "content": "hi"}]
+    )
+    return response.choices[0].message.content
+
+# -------------------------
+# Retries, hedging, breaker
+# -------------------------
+
+def test_retries_server_errors_with_backoff(server):
+    server.actions = [("error", 500), ("error", 503)]
+
+    assert ask(make_client(server)) == "SELECT 1"
+    assert server.requests == 3
+
+
+def test_client_errors_are_not_retried(server):
+    server.actions = [("error", 400)]
+
+    with pytest.raises(Exception) as info:
+        ask(make_client(server))
+
+    assert not isinstance(info.value, LLMUnavailable)
+    assert server.requests == 1
+
+
+def test_slow_request_is_hedged(server):
+    server.actions = [("ok", 2.0), ("ok", 0)]
+    client = make_client(server, hedge_default_delay=0.1)
+
+    start = time.monotonic()
+    assert ask(client) == "SELECT 1"
+
+    assert time.monotonic() - start < 1.0
+    assert client.hedges == 1
+
+
+def test_every_request_sent_is_charged(server):
+    server.actions = [("error", 500), ("ok", 2.0), ("ok", 0)]
+    charges = []
+
+    def charge(hedge):
+        charges.append(hedge)
+        return True
+
+    client = make_client(server, hedge_default_delay=0.1, before_request=charge)
+    assert ask(client) == "SELECT 1"
+
+    # retry after the 500, then a hedge for the slow second attempt
+    assert charges == [False, False, True]
+    assert server.requests == 3
+
+
+def test_hedge_is_skipped_without_capacity(server):
+    server.actions = [("ok", 0.3)]
+    client = make_client(
+        server, hedge_default_delay=0.05, before_request=lambda hedge: not hedge
+    )
+
+    assert ask(client) == "SELECT 1"
+    assert client.hedges == 0
+    assert server.requests == 1
+
+
+def test_our_own_bugs_are_not_retried():
+    calls = []
+
+    class Broken:
+        @property
+        def chat(self):
+            calls.append(1)
+            raise AttributeError("bug in our code")
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=60)
+    client = ResilientLLMClient(lambda: Broken(), breaker=breaker, backoff_base=0.01)
+
+    with pytest.raises(AttributeError):
+        client.create(model="gpt-4o-mini", messages=[])
+
+    assert calls == [1]
+    assert breaker.state == "closed"
+
+
+def test_rejected_charge_frees_the_half_open_trial(server):
+    clock = [0.0]
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=30, clock=lambda: clock[0])
+    breaker.record_failure()
+    clock[0] = 31
+
+    def rejected(hedge):
+        raise RuntimeError("no capacity")
+
+    client = make_client(server, breaker=breaker, before_request=rejected)
+    with pytest.raises(RuntimeError):
+        ask(client)
+
+    assert breaker.state == "half_open"
+    client.before_request = None
+    assert ask(client) == "SELECT 1"
+    assert breaker.state == "closed"
+
+
+def test_circuit_opens_after_repeated_failures(server):
+    server.actions = [("error", 500)] * 4
+    client = make_client(
+        server,
+        max_attempts=2,
+        breaker=CircuitBreaker(failure_threshold=2, reset_after=60)
+    )
+
+    for _ in range(2):
+        with pytest.raises(LLMUnavailable):
+            ask(client)
+
+    with pytest.raises(CircuitOpenError):
+        ask(client)
+    assert server.requests == 4
+
+# -------------------------
+# Graceful degradation
+# -------------------------
+
+def test_title_and_explanation_degrade_when_circuit_open(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=60)
+    breaker.record_failure()
+    monkeypatch.setattr(engine, "llm", ResilientLLMClient(lambda: None, breaker=breaker))
+    monkeypatch.setattr(engine, "get_data_version", lambda: 1)
+    monkeypatch.setattr(engine, "explanation_cache", ExplanationCache())
+
+    assert engine.generate_chat_title("how many orders per year?") == "How Many Orders Per Year"
+
+    question = "orders per year?"
+    cached = {"insights": ["Orders grew"], "recommendations": []}
+    engine.explanation_cache.put("old-result", 1, cached, question=engine.normalize_question(question))
+
+    stale = engine.explain_result(question, ["y"], [("2018",)])
+    assert stale["insights"] == cached["insights"]
+    assert "earlier result" in stale["note"]
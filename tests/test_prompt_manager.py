@@ -0,0 +1,69 @@
+import os
+from types import SimpleNamespace
+from src.prompt_manager import PromptManager, PromptTemplate
+import src.genai_sql_engine as engine
+
+TEMPLATE = "Rules {{strict}}\nSchema:\n{schema}\nQuestion:\n{question}\n"
+
+# -------------------------
+# Prefix / suffix split
+# -------------------------
+
+def test_render_split_matches_format():
+    template = PromptTemplate(TEMPLATE)
+    prefix, suffix = template.render_split({"schema": "S"}, {"question": "Q"})
+
+    assert prefix + suffix == TEMPLATE.format(schema="S", question="Q")
+    assert prefix.endswith("Question:\n")
+    assert suffix == "Q\n"
+
+# -------------------------
+# File watching
+# -------------------------
+
+def test_get_reloads_only_when_file_changes(tmp_path):
+    path = tmp_path / "p.txt"
+    path.write_text("v1 {question}")
+    manager = PromptManager(tmp_path)
+
+    first = manager.get("p")
+    assert manager.get("p") is first
+
+    path.write_text("v2 {question}")
+    os.utime(path, ns=(0, path.stat().st_mtime_ns + 1_000_000))
+    assert manager.get("p").text == "v2 {question}"
+
+# -------------------------
+# generate_sql message layout
+# -------------------------
+
+def test_generate_sql_keeps_schema_prefix_stable(monkeypatch):
+    sent = []
+
+    def fake_create(**kwargs):
+        sent.append(kwargs["messages"])
+        usage = SimpleNamespace(
+            prompt_tokens=100,
+            completion_tokens=5,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=80)
+        )
+        message = SimpleNamespace(content="SELECT 1")
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=usage)
+
+    fake_client = SimpleNamespace(
+        chat=SimpleNamespace(completions=SimpleNamespace(create=fake_create))
+    )
+    monkeypatch.setattr(engine, "get_client", lambda: fake_client)
+    monkeypatch.setattr(engine, "prompt_manager", PromptManager(engine.PROMPTS_DIR))
+
+    prompt = engine.load_prompt_template()
+    engine.generate_sql(prompt, "CREATE TABLE t (a)", "first question")
+    engine.generate_sql(prompt, "CREATE TABLE t (a)", "second question")
+
+    assert sent[0][0] == sent[1][0]
+    assert "CREATE TABLE t (a)" in sent[0][0]["content"]
+    assert sent[1][1]["content"].strip() == "second question"
+
+    stats = engine.get_prompt_stats()["sql_generator_prompt"]
+    assert stats["prefix_reuse_rate"] == 0.5
+    assert stats["cached_token_rate"] == 0.8
@@ -0,0 +1,127 @@
+import pytest
+import src.approximate as approximate
+from src import snapshot
+from src.backends import SQLiteBackend
+from src.refresh import refresh_database
+
+ORDERS_HEADER = "order_id,order_status,order_purchase_timestamp\n"
+REVIEWS_HEADER = "review_id,order_id,review_score,review_comment_title,review_comment_message\n"
+GEO_HEADER = "geolocation_zip_code_prefix,geolocation_lat,geolocation_lng,geolocation_city,geolocation_state\n"
+
+
+def orders(n, status="delivered"):
+    return "".join(f"o{i},{status},2018-01-0{i % 9 + 1} 10:00:00\n" for i in range(n))
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    monkeypatch.setattr(approximate, "MIN_SAMPLED_TABLE_ROWS", 10)
+
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    (csv_dir / "orders.csv").write_text(ORDERS_HEADER + orders(20))
+    (csv_dir / "order_reviews.csv").write_text(
+        REVIEWS_HEADER + "r1,o1,1,Ruim,Produto quebrado\n"
+    )
+    (csv_dir / "geolocation.csv").write_text(GEO_HEADER + "1001,-23.55,-46.63,sao paulo,SP\n")
+    (csv_dir / "sellers.csv").write_text("seller_id,seller_state\ns1,SP\n")
+
+    backend = SQLiteBackend(tmp_path / "target.db", csv_dir)
+    backend.initialize()
+    return backend, csv_dir
+
+
+def refresh(backend, csv_dir):
+    return refresh_database(backend.db_path, csv_dir, batch_rows=7)
+
+
+def test_refresh_upserts_changed_rows(setup):
+    backend, csv_dir = setup
+    (csv_dir / "orders.csv").write_text(
+        ORDERS_HEADER + orders(20).replace("o3,delivered", "o3,canceled") + "o20,shipped,2018-02-01 10:00:00\n"
+    )
+
+    assert refresh(backend, csv_dir) == {"orders": (1, 1)}
+
+    _, rows = backend.execute("SELECT order_status, COUNT(*) FROM orders GROUP BY 1 ORDER BY 1")
+    assert rows == [("canceled", 1), ("delivered", 19), ("shipped", 1)]
+    _, rows = backend.execute("SELECT source_rows FROM _sample_manifest WHERE table_name = 'orders'")
+    assert rows == [(21,)]
+    # New strata are kept whole until the next full build
+    _, rows = backend.execute("SELECT order_status FROM _sample_orders WHERE order_id = 'o20'")
+    assert rows == [("shipped",)]
+
+
+def test_refresh_updates_text_and_spatial_indexes(setup):
+    backend, csv_dir = setup
+    (csv_dir / "order_reviews.csv").write_text(
+        REVIEWS_HEADER + "r1,o1,4,Bom,Produto chegou bem\nr2,o2,1,Atraso,Entrega atrasada\n"
+    )
+    (csv_dir / "geolocation.csv").write_text(
+        GEO_HEADER + "1001,-23.55,-46.63,sao paulo,SP\n1001,-23.57,-46.65,sao paulo,SP\n"
+        "20010,-22.90,-43.17,rio de janeiro,RJ\n"
+    )
+
+    results = refresh(backend, csv_dir)
+
+    assert results == {"order_reviews": (1, 1), "geolocation": (2, 0)}
+    fts = "SELECT rowid FROM order_reviews_fts WHERE order_reviews_fts MATCH '{}'"
+    assert backend.execute(fts.format("quebrado"))[1] == []
+    assert len(backend.execute(fts.format("chegou OR atras*"))[1]) == 2
+
+    _, rows = backend.execute(
+        "SELECT zip_code_prefix, ROUND(lat, 2), points FROM geolocation_centroids ORDER BY 1"
+    )
+    assert rows == [(1001, -23.56, 2), (20010, -22.9, 1)]
+    assert backend.execute("SELECT COUNT(*) FROM geolocation_rtree")[1] == [(2,)]
+
+
+def test_refresh_bumps_only_touched_table_versions(setup, monkeypatch):
+    backend, csv_dir = setup
+    before = backend.table_versions({"orders", "sellers", "_sample_orders"})
+    data_version = backend.data_version()
+
+    (csv_dir / "orders.csv").write_text(ORDERS_HEADER + orders(21))
+    refresh(backend, csv_dir)
+
+    after = dict(backend.table_versions({"orders", "sellers", "_sample_orders"}))
+    assert backend.data_version() == data_version + 1
+    assert after["orders"] == after["_sample_orders"] == data_version + 1
+    assert after["sellers"] == dict(before)["sellers"]
+
+    # The manifest now matches the CSVs: no rebuild, nothing left to refresh
+    monkeypatch.setattr(snapshot, "build_sqlite", pytest.fail)
+    backend.initialize()
+    assert refresh(backend, csv_dir) == {}
+
+
+def test_duckdb_exports_refreshed_rows_not_the_drop(setup, tmp_path):
+    pytest.importorskip("duckdb")
+    from src.backends import DuckDBBackend
+
+    backend, csv_dir = setup
+    duckdb_backend = DuckDBBackend(tmp_path / "parquet", backend.db_path)
+    duckdb_backend.initialize()
+
+    # A partial drop: only the new order
+    (csv_dir / "orders.csv").write_text(ORDERS_HEADER + "o20,shipped,2018-02-01 10:00:00\n")
+    refresh(backend, csv_dir)
+    duckdb_backend.initialize()
+
+    count = "SELECT COUNT(*) AS n FROM orders"
+    assert duckdb_backend.execute(count) == backend.execute(count) == (["n"], [(21,)])
+
+
+def test_restart_applies_a_partial_drop_instead_of_rebuilding(setup):
+    backend, csv_dir = setup
+    # Today's drop: one new order and one correction, nothing else
+    (csv_dir / "orders.csv").write_text(
+        ORDERS_HEADER + "o3,canceled,2018-01-04 10:00:00\no20,shipped,2018-02-01 10:00:00\n"
+    )
+
+    backend.initialize()
+
+    _, rows = backend.execute("SELECT order_status, COUNT(*) FROM orders GROUP BY 1 ORDER BY 1")
+    assert rows == [("canceled", 1), ("delivered", 19), ("shipped", 1)]
+    # Recorded as applied: the next start does nothing
+    assert snapshot.read_db_manifest(backend.db_path) == snapshot.csv_hashes(csv_dir)
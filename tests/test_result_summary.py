@@ -0,0 +1,37 @@
+from src.result_summary import estimate_tokens, summarize_result
+
+
+def monthly_rows(n):
+    return [(f"{2016 + m // 12}-{m % 12 + 1:02d}", 100 + 10 * m) for m in range(n)]
+
+# -------------------------
+# Small results pass through
+# -------------------------
+
+def test_small_result_is_sent_verbatim():
+    text = summarize_result(["a", "b"], [(1, "x"), (2, "y")])
+    assert text == "All 2 rows:\n(1, 'x')\n(2, 'y')"
+
+# -------------------------
+# Large results are summarized
+# -------------------------
+
+def test_large_result_has_stats_trend_and_extremes():
+    rows = monthly_rows(400)
+    rows[150] = (rows[150][0], 99999)
+
+    text = summarize_result(["order_month", "total_orders"], rows)
+
+    assert "Rows: 400" in text
+    assert "total_orders (numeric): min 100, max 99,999" in text
+    assert "total_orders: +" in text
+    assert "#151: ('2028-07', 99999)" in text
+    assert "#400:" in text
+
+
+def test_summary_respects_token_budget():
+    rows = [(f"customer_{i}", "state_" + "x" * 40, float(i)) for i in range(5000)]
+
+    text = summarize_result(["id", "state", "value"], rows, token_budget=200)
+
+    assert estimate_tokens(text) <= 200
@@ -0,0 +1,128 @@
+import json
+import threading
+import pytest
+
+pytest.importorskip("fastapi")
+from fastapi.testclient import TestClient
+
+import service
+import src.genai_sql_engine as engine
+from src.admission import AdmissionRejected
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(engine, "initialize_database", lambda: None)
+    monkeypatch.setattr(engine, "load_schema", lambda: "schema")
+    monkeypatch.setattr(engine, "load_prompt_template", lambda: "{schema} {question}")
+    with TestClient(service.app) as c:
+        yield c
+
+# -------------------------
+# JSON endpoints
+# -------------------------
+
+def test_query_returns_sql_and_rows(client, monkeypatch):
+    monkeypatch.setattr(
+        engine, "run_admitted",
+        lambda prompt, schema, question, user_id, priority, approximate, session_id, followup: ("SELECT 1 AS a", ["a"], [(1,)])
+    )
+
+    resp = client.post("/query", json={"question": "anything"})
+
+    assert resp.status_code == 200
+    assert resp.json() == {"sql": "SELECT 1 AS a", "columns": ["a"], "rows": [[1]]}
+
+
+def test_admission_rejection_maps_to_429(client, monkeypatch):
+    def rejected(*args, **kwargs):
+        raise AdmissionRejected("busy")
+
+    monkeypatch.setattr(engine, "run_admitted", rejected)
+
+    assert client.post("/query", json={"question": "q"}).status_code == 429
+
+
+def test_explain_is_admitted_per_user(client, monkeypatch):
+    def no_llm(*args, **kwargs):
+        raise AssertionError("explanation generated past the user limit")
+
+    def rejected(user_id, priority=0):
+        assert user_id == "dashboard"
+        raise AdmissionRejected("busy")
+
+    monkeypatch.setattr(engine, "explain_result", no_llm)
+    monkeypatch.setattr(engine.admission, "acquire", rejected)
+
+    resp = client.post("/explain", json={
+        "question": "q", "columns": ["a"], "rows": [[1]], "user_id": "dashboard"
+    })
+
+    assert resp.status_code == 429
+
+
+def test_explain_maps_engine_errors(client, monkeypatch):
+    def failing(*args, **kwargs):
+        raise TimeoutError("no connection")
+
+    monkeypatch.setattr(engine, "explain_result", failing)
+
+    resp = client.post("/explain", json={"question": "q", "columns": ["a"], "rows": [[1]]})
+
+    assert resp.status_code == 503
+
+# -------------------------
+# NDJSON streaming
+# -------------------------
+
+def test_stream_emits_header_then_row_batches(client, monkeypatch):
+    def fake_stream(sql, batch_size, timeout=None):
+        yield ["a"]
+        yield [(1,), (2,)]
+        yield [(3,)]
+
+    monkeypatch.setattr(engine, "prepare_sql", lambda prompt, schema, question: "SELECT a FROM t")
+    monkeypatch.setattr(engine, "stream_sql", fake_stream)
+
+    resp = client.post("/query/stream", json={"question": "q"})
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+
+    assert lines[0] == {"sql": "SELECT a FROM t", "columns": ["a"]}
+    assert lines[1:] == [{"rows": [[1], [2]]}, {"rows": [[3]]}]
+
+
+def test_stream_refuses_fields_it_cannot_honour(client):
+    resp = client.post("/query/stream", json={"question": "q", "followup": True})
+    assert resp.status_code == 422
+
+
+def test_stream_sheds_load_instead_of_blocking(client, monkeypatch):
+    monkeypatch.setattr(engine, "prepare_sql", lambda prompt, schema, question: "SELECT 1")
+
+    def pool_exhausted(sql, batch_size, timeout=None):
+        raise TimeoutError("no idle SQLite connection")
+        yield
+
+    monkeypatch.setattr(engine, "stream_sql", pool_exhausted)
+    assert client.post("/query/stream", json={"question": "q"}).status_code == 503
+    # The slot was given back
+    assert service.resources["streams"].acquire(blocking=False)
+    service.resources["streams"].release()
+
+    monkeypatch.setitem(service.resources, "streams", threading.BoundedSemaphore(1))
+    service.resources["streams"].acquire()
+    assert client.post("/query/stream", json={"question": "q"}).status_code == 503
+
+
+def test_stream_charges_sqlite_capacity_off_the_event_loop(client, monkeypatch):
+    charged_on = []
+
+    def charge(resource, blocking=True):
+        charged_on.append(threading.current_thread().name)
+        raise AdmissionRejected("busy")
+
+    monkeypatch.setattr(engine, "prepare_sql", lambda prompt, schema, question: "SELECT 1")
+    monkeypatch.setattr(engine.admission, "charge", charge)
+
+    assert client.post("/query/stream", json={"question": "q"}).status_code == 429
+    assert charged_on and charged_on[0].startswith("sqlite")
@@ -0,0 +1,53 @@
+import sqlite3
+from src import snapshot
+from src.backends import SQLiteBackend
+
+
+def write_csv(csv_dir, rows):
+    csv_dir.mkdir(exist_ok=True)
+    (csv_dir / "sellers.csv").write_text(
+        "seller_id,seller_state\n" + "".join(f"{r},SP\n" for r in rows)
+    )
+
+
+def row_count(db_path):
+    conn = sqlite3.connect(db_path)
+    count = conn.execute("SELECT COUNT(*) FROM sellers").fetchone()[0]
+    conn.close()
+    return count
+
+# -------------------------
+# Snapshot restore + skip
+# -------------------------
+
+def test_initialize_restores_matching_snapshot(tmp_path, monkeypatch):
+    csv_dir = tmp_path / "csv"
+    write_csv(csv_dir, ["a", "b"])
+    snapshot.build_snapshot(csv_dir, tmp_path / "snapshot")
+
+    def no_csv_parse(*args, **kwargs):
+        raise AssertionError("CSV was re-parsed")
+
+    monkeypatch.setattr(snapshot, "build_sqlite", no_csv_parse)
+
+    backend = SQLiteBackend(tmp_path / "target.db", csv_dir, tmp_path / "snapshot")
+    backend.initialize()
+    backend.initialize()
+
+    assert row_count(tmp_path / "target.db") == 2
+    assert "_build_manifest" not in backend.load_schema()
+
+# -------------------------
+# Changed CSVs rebuild
+# -------------------------
+
+def test_initialize_rebuilds_when_csv_changes(tmp_path):
+    csv_dir = tmp_path / "csv"
+    write_csv(csv_dir, ["a", "b"])
+    snapshot.build_snapshot(csv_dir, tmp_path / "snapshot")
+
+    write_csv(csv_dir, ["a", "b", "c"])
+    backend = SQLiteBackend(tmp_path / "target.db", csv_dir, tmp_path / "snapshot")
+    backend.initialize()
+
+    assert row_count(tmp_path / "target.db") == 3
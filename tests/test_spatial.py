@@ -0,0 +1,110 @@
+from pathlib import Path
+
+import pytest
+from src.backends import DuckDBBackend, SQLiteBackend
+from src.spatial import SCHEMA_NOTES, haversine_km
+
+# Two points per zip prefix, plus one outlier far outside Brazil
+GEOLOCATION_CSV = (
+    "geolocation_zip_code_prefix,geolocation_lat,geolocation_lng,geolocation_city,geolocation_state\n"
+    "01001,-23.55,-46.63,sao paulo,SP\n"
+    "01001,-23.56,-46.64,sao paulo,SP\n"
+    "01001,48.85,2.35,paris,SP\n"
+    "20010,-22.90,-43.17,rio de janeiro,RJ\n"
+    "20010,-22.91,-43.18,rio de janeiro,RJ\n"
+    "13023,-22.90,-47.06,campinas,SP\n"
+)
+
+SELLERS_CSV = (
+    "seller_id,seller_zip_code_prefix\n"
+    "s1,01001\n"
+    "s2,20010\n"
+    "s3,13023\n"
+)
+
+WITHIN_100_KM_OF_SAO_PAULO = """
+SELECT s.seller_id
+FROM geolocation_rtree r
+JOIN geolocation_centroids c ON c.zip_code_prefix = r.id
+JOIN sellers s ON s.seller_zip_code_prefix = c.zip_code_prefix
+WHERE r.min_lat >= -23.55 - km_lat_delta(100) AND r.max_lat <= -23.55 + km_lat_delta(100)
+  AND r.min_lng >= -46.63 - km_lng_delta(100, -23.55)
+  AND r.max_lng <= -46.63 + km_lng_delta(100, -23.55)
+  AND haversine_km(-23.55, -46.63, c.lat, c.lng) <= 100
+ORDER BY s.seller_id
+"""
+
+
+@pytest.fixture
+def backend(tmp_path):
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    (csv_dir / "geolocation.csv").write_text(GEOLOCATION_CSV)
+    (csv_dir / "sellers.csv").write_text(SELLERS_CSV)
+
+    backend = SQLiteBackend(tmp_path / "target.db", csv_dir)
+    backend.initialize()
+    return backend
+
+
+def test_haversine_km_sao_paulo_to_rio():
+    assert haversine_km(-23.55, -46.63, -22.91, -43.17) == pytest.approx(360, abs=5)
+    assert haversine_km(None, 0, 0, 0) is None
+
+
+def test_centroids_deduplicate_and_drop_outliers(backend):
+    cols, rows = backend.execute(
+        "SELECT zip_code_prefix, lat, city, points FROM geolocation_centroids ORDER BY 1"
+    )
+
+    assert [r[0] for r in rows] == [1001, 13023, 20010]
+    assert rows[0][1] == pytest.approx(-23.555)
+    assert rows[0][2:] == ("sao paulo", 2)
+
+
+def test_distance_query_uses_rtree(backend):
+    cols, rows = backend.execute(WITHIN_100_KM_OF_SAO_PAULO)
+    plan = " ".join(backend.query_plan(WITHIN_100_KM_OF_SAO_PAULO))
+
+    assert rows == [("s1",), ("s3",)]
+    assert "VIRTUAL TABLE INDEX" in plan
+
+
+def test_schema_hides_rtree_shadow_tables(backend):
+    schema = backend.load_schema()
+
+    assert "geolocation_rtree" in schema and "haversine_km" in schema
+    assert "geolocation_rtree_node" not in schema
+
+
+def test_schema_notes_example_runs_as_written(backend):
+    lines = SCHEMA_NOTES.splitlines()
+    start = next(i for i, line in enumerate(lines) if line.strip() == "--   SELECT c.zip_code_prefix")
+    example = "\n".join(line[len("--   "):] for line in lines[start:start + 7])
+
+    assert ":lat" not in SCHEMA_NOTES
+    assert backend.execute(example)[1] == [(1001,)]
+
+
+def test_spatial_rules_only_come_with_the_spatial_tables(tmp_path):
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    (csv_dir / "sellers.csv").write_text(SELLERS_CSV)
+    backend = SQLiteBackend(tmp_path / "target.db", csv_dir)
+    backend.initialize()
+    prompt = (Path(__file__).parent.parent / "prompts" / "sql_generator_prompt.txt").read_text()
+
+    for text in (backend.load_schema(), prompt):
+        assert "geolocation_centroids" not in text
+        assert "haversine_km" not in text
+    assert "order_reviews_fts" not in prompt
+
+
+def test_distance_queries_stay_on_sqlite(tmp_path, monkeypatch):
+    duckdb = DuckDBBackend(tmp_path, tmp_path)
+    monkeypatch.setattr(duckdb, "table_names", lambda: {"sellers", "geolocation"})
+
+    assert duckdb.can_execute("SELECT COUNT(*) FROM sellers")
+    assert not duckdb.can_execute(
+        "SELECT haversine_km(geolocation_lat, geolocation_lng, 0, 0) FROM geolocation"
+    )
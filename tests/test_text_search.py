@@ -0,0 +1,64 @@
+import pytest
+from src.approximate import estimate_sql
+from src.backends import SQLiteBackend
+
+REVIEWS_CSV = (
+    "review_id,order_id,review_score,review_comment_title,review_comment_message\n"
+    "r1,o1,1,Péssimo,Produto não chegou e está atrasado\n"
+    "r2,o2,5,,Recomendo muito o vendedor\n"
+    "r3,o3,2,Atraso,A entrega atrasou uma semana\n"
+    "r4,o4,4,,\n"
+    "r5,o5,1,Não recebi,Nao recebi o produto\n"
+)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    csv_dir = tmp_path / "csv"
+    csv_dir.mkdir()
+    (csv_dir / "order_reviews.csv").write_text(REVIEWS_CSV, encoding="utf-8")
+
+    backend = SQLiteBackend(tmp_path / "target.db", csv_dir)
+    backend.initialize()
+    return backend
+
+
+def search(backend, query):
+    _, rows = backend.execute(f"""
+        SELECT r.review_id
+        FROM order_reviews_fts f
+        JOIN order_reviews r ON r.rowid = f.rowid
+        WHERE order_reviews_fts MATCH '{query}'
+        ORDER BY bm25(order_reviews_fts), r.review_id
+    """)
+    return [review_id for (review_id,) in rows]
+
+
+def test_match_ignores_accents_and_case(backend):
+    assert search(backend, '"nao recebi"') == ["r5"]
+    assert sorted(search(backend, "NÃO")) == ["r1", "r5"]
+
+
+def test_prefix_query_covers_word_forms(backend):
+    assert sorted(search(backend, "atras*")) == ["r1", "r3"]
+
+
+def test_column_filter_and_vocab(backend):
+    assert search(backend, "review_comment_title : atraso") == ["r3"]
+
+    _, rows = backend.execute(
+        "SELECT doc FROM order_reviews_vocab WHERE term = 'produto'"
+    )
+    assert rows == [(2,)]
+
+
+def test_schema_describes_fts_without_shadow_tables(backend):
+    schema = backend.load_schema()
+
+    assert "order_reviews_fts" in schema and "bm25" in schema
+    assert "order_reviews_fts_data" not in schema
+
+
+def test_text_search_is_never_approximated():
+    sql = "SELECT COUNT(*) FROM order_reviews_fts WHERE order_reviews_fts MATCH 'atras*'"
+    assert estimate_sql(sql, {"order_reviews": 100_000}) is None